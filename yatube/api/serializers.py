@@ -0,0 +1,80 @@
+"""Представление постов и комментариев в JSON с выбором полей.
+
+Клиент перечисляет нужные поля в ?fields=id,text,author. По списку
+строится и ответ, и запрос: select_related и only() берут только те
+таблицы и колонки, которые понадобятся.
+"""
+from django.urls import reverse
+
+
+class Field:
+    def __init__(self, value, columns, related=None):
+        self.value = value
+        self.columns = columns
+        self.related = related
+
+
+POST_FIELDS = {
+    'id': Field(lambda post: post.pk, ('id',)),
+    'text': Field(lambda post: post.text, ('text',)),
+    'pub_date': Field(
+        lambda post: post.pub_date.isoformat(), ('pub_date',)),
+    'author': Field(
+        lambda post: post.author.username,
+        ('author', 'author__username'), 'author'),
+    'group': Field(
+        lambda post: post.group.slug if post.group_id else None,
+        ('group', 'group__slug'), 'group'),
+    'image': Field(
+        lambda post: post.image.url if post.image else None, ('image',)),
+    'comments_count': Field(
+        lambda post: post.comments_count, ('comments_count',)),
+    'url': Field(
+        lambda post: reverse('posts:post_detail', args=[post.pk]), ('id',)),
+}
+
+COMMENT_FIELDS = {
+    'id': Field(lambda comment: comment.pk, ('id',)),
+    'post': Field(lambda comment: comment.post_id, ('post',)),
+    'author': Field(
+        lambda comment: comment.author.username,
+        ('author', 'author__username'), 'author'),
+    'text': Field(lambda comment: comment.text, ('text',)),
+    'created': Field(
+        lambda comment: comment.created.isoformat(), ('created',)),
+}
+
+
+class UnknownFields(ValueError):
+    pass
+
+
+def parse_fields(request, available):
+    """Поля из ?fields=…; без параметра — все. Неизвестное поле — ошибка."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise UnknownFields(
+            'Неизвестные поля: {}. Доступны: {}.'.format(
+                ', '.join(unknown), ', '.join(available)))
+    return names
+
+
+def restrict(queryset, names, available, always=('id',)):
+    """Ограничивает запрос колонками и JOIN, нужными для полей names."""
+    fields = [available[name] for name in names]
+    columns = set(always)
+    for field in fields:
+        columns.update(field.columns)
+    related = sorted({field.related for field in fields if field.related})
+    if related:
+        # select_related() без аргументов подтянул бы все внешние ключи.
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+def serialize(obj, names, available):
+    return {name: available[name].value(obj) for name in names}
@@ -0,0 +1,175 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+                text=f'Пост {number}',
+            )
+            for number in range(15)
+        ]
+        cls.post = cls.posts[-1]
+        for number in range(25):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Коммент {number}')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def get(self, name, client=None, args=(), **params):
+        response = (client or self.guest).get(
+            reverse(f'api:{name}', args=args), params)
+        return response, response.json()
+
+    def post_json(self, url, data, client=None):
+        return (client or self.client).post(
+            url, json.dumps(data), content_type='application/json')
+
+    def test_feeds_paginated_by_cursor(self):
+        """Ленты отдаются страницами, следующая — по next_cursor"""
+        feeds = {
+            'posts': ((), None, 15),
+            'group_posts': ((self.group.slug,), None, 7),
+            'author_posts': ((self.author.username,), None, 15),
+            'follow_posts': ((), self.client, 15),
+        }
+        for name, (args, client, total) in feeds.items():
+            with self.subTest(feed=name):
+                response, data = self.get(name, client, args, limit=10)
+                self.assertEqual(response.status_code, 200)
+                ids = [post['id'] for post in data['results']]
+                if data['next_cursor']:
+                    _, data = self.get(
+                        name, client, args, limit=10,
+                        cursor=data['next_cursor'])
+                    ids += [post['id'] for post in data['results']]
+                self.assertEqual(len(ids), total)
+                self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_sparse_fieldsets(self):
+        """?fields= сужает и ответ, и запрос к базе"""
+        with CaptureQueriesContext(connection) as queries:
+            _, data = self.get('posts', fields='id,text')
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"image"', sql)
+
+        _, data = self.get('posts', fields='author,group', limit=2)
+        self.assertEqual(data['results'], [
+            {'author': self.author.username, 'group': None},
+            {'author': self.author.username, 'group': self.group.slug},
+        ])
+
+        response, data = self.get('posts', fields='id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['error'])
+
+    def test_post_detail_and_batch(self):
+        """Пост по id и несколько постов одним запросом в заданном порядке"""
+        response, data = self.get('post_detail', args=(self.post.pk,))
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['comments_count'], 25)
+
+        response, data = self.get('post_detail', args=(10 ** 6,))
+        self.assertEqual(response.status_code, 404)
+
+        ids = [self.posts[3].pk, 10 ** 6, self.posts[1].pk]
+        with CaptureQueriesContext(connection) as queries:
+            response, data = self.get(
+                'posts_batch', ids=','.join(map(str, ids)), fields='id')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            data['results'], [{'id': ids[0]}, {'id': ids[2]}])
+        self.assertEqual(data['missing'], [10 ** 6])
+
+        response, _ = self.get('posts_batch', ids='1,x')
+        self.assertEqual(response.status_code, 400)
+
+    def test_comments(self):
+        """Комментарии листаются от старых к новым, ?order=newest — наоборот"""
+        _, data = self.get('comments', args=(self.post.pk,))
+        self.assertEqual(data['results'][0]['text'], 'Коммент 0')
+        self.assertEqual(len(data['results']), 20)
+        _, data = self.get(
+            'comments', args=(self.post.pk,), cursor=data['next_cursor'])
+        self.assertEqual(len(data['results']), 5)
+        _, data = self.get('comments', args=(self.post.pk,), order='newest')
+        self.assertEqual(data['results'][0]['text'], 'Коммент 24')
+
+    def test_create_post_and_comment(self):
+        """Создание поста и комментария с проверкой формами сайта"""
+        url = reverse('api:posts')
+        response = self.post_json(
+            url, {'text': 'Из API', 'group': self.group.pk})
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual(post.author, self.reader)
+        self.assertEqual(post.group, self.group)
+
+        response = self.post_json(url, {'text': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+
+        response = self.post_json(reverse(
+            'api:comments', args=(post.pk,)), {'text': 'Ответ'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['author'], self.reader.username)
+        self.assertTrue(post.comments.filter(text='Ответ').exists())
+
+    def test_writes_require_login(self):
+        """Запись без входа — 401, чужой метод — 405"""
+        response = self.post_json(
+            reverse('api:posts'), {'text': 'Аноним'}, self.guest)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Post.objects.filter(text='Аноним').exists())
+        response, _ = self.get('follow_posts')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.put(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET, POST')
+
+    def test_follow_and_unfollow(self):
+        """Подписка, повторная подписка, отписка и запрет подписки на себя"""
+        writer = User.objects.create_user(username='writer')
+        for number in range(30):
+            Post.objects.create(author=writer, text=f'Пост {number}')
+        url = reverse('api:follow', args=(writer.username,))
+        # Бюджет follow ровно по делу: посты автора переносятся в ленту
+        # одним запросом, сколько бы их ни было.
+        with self.assertNumQueries(18):
+            self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader, author=writer).count(), 30)
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=writer).exists())
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(
+            Follow.objects.filter(user=self.reader, author=writer).exists())
+
+        own = reverse('api:follow', args=(self.reader.username,))
+        self.assertEqual(self.client.post(own).status_code, 400)
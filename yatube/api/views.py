@@ -0,0 +1,275 @@
+"""JSON API v1 поверх моделей и правил posts.
+
+Авторизация та же, что у сайта: сессия и CSRF-токен для изменяющих
+запросов. Ленты листаются курсором (?cursor=, ?limit=), состав полей
+задаётся ?fields=.
+"""
+import functools
+import json
+
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from core.query_budget import query_budget
+from core.thumbnails import queue_thumbnails
+from core.transactions import write_atomic
+from posts import archive, updates
+from posts.forms import CommentForm, PostForm
+from posts.models import (ArchivedPost, Follow, Group, Post, TimelineEntry,
+                          User)
+from posts.paginators import (COMMENTS_PER_PAGE, POSTS_PER_PAGE,
+                              CursorPaginator, MergedCursorPaginator)
+
+from .serializers import (COMMENT_FIELDS, POST_FIELDS, UnknownFields,
+                          parse_fields, restrict, serialize)
+
+MAX_LIMIT = 100
+MAX_BATCH = 100
+
+
+def error(status, message, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+def api_view(methods, login=()):
+    """Методы, которые принимает view, и те из них, что требуют входа.
+
+    Ошибки отдаются в JSON: 405 для чужого метода, 401 без входа,
+    404 вместо HTML-страницы и 400 для неизвестных полей.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = error(405, 'Метод не поддерживается.')
+                response['Allow'] = ', '.join(methods)
+                return response
+            if request.method in login and not request.user.is_authenticated:
+                return error(401, 'Требуется вход.')
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return error(404, 'Не найдено.')
+            except UnknownFields as exc:
+                return error(400, str(exc))
+        return wrapper
+    return decorator
+
+
+def _limit(request, default):
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        return default
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def _data(request):
+    """Тело запроса: JSON или обычная форма (с файлами)."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            raise ValueError('Тело запроса должно быть JSON-объектом.')
+        return data, None
+    return request.POST, request.FILES
+
+
+def _page(paginator, request, names, available):
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': [serialize(obj, names, available) for obj in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def _post_feed(request, queryset, archived=None):
+    """Лента постов; archived — архивные посты той же ленты, которые
+    курсор листает следом за горячими, как на сайте."""
+    names = parse_fields(request, POST_FIELDS)
+    queryset = restrict(queryset, names, POST_FIELDS, ('id', 'pub_date'))
+    limit = _limit(request, POSTS_PER_PAGE)
+    newest = archive.horizon() if archived is not None else None
+    if newest is not None:
+        paginator = MergedCursorPaginator(
+            [queryset, restrict(
+                archived, names, POST_FIELDS, ('id', 'pub_date'))],
+            limit, newest=[None, newest])
+    else:
+        paginator = CursorPaginator(queryset, limit)
+    return JsonResponse(_page(paginator, request, names, POST_FIELDS))
+
+
+@query_budget(12)
+@api_view(['GET', 'POST'], login=['POST'])
+def posts(request):
+    if request.method == 'POST':
+        return _create_post(request)
+    return _post_feed(request, Post.objects.all())
+
+
+def _create_post(request):
+    try:
+        data, files = _data(request)
+    except ValueError as exc:
+        return error(400, str(exc))
+    form = PostForm(data, files=files)
+    if not form.is_valid():
+        return error(
+            400, 'Неверные данные.', errors=form.errors.get_json_data())
+    post = form.save(commit=False)
+    post.author = request.user
+
+    def publish():
+        post.save()
+        queue_thumbnails(post.image, post.pk)
+        transaction.on_commit(updates.notifier.notify)
+
+    write_atomic(publish)
+    names = parse_fields(request, POST_FIELDS)
+    return JsonResponse(serialize(post, names, POST_FIELDS), status=201)
+
+
+@query_budget(5)
+@api_view(['GET'])
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return _post_feed(
+        request, Post.objects.filter(group=group),
+        ArchivedPost.objects.filter(group=group))
+
+
+@query_budget(5)
+@api_view(['GET'])
+def author_posts(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return _post_feed(
+        request, Post.objects.filter(author=author),
+        ArchivedPost.objects.filter(author=author))
+
+
+@query_budget(4)
+@api_view(['GET'], login=['GET'])
+def follow_posts(request):
+    """Лента подписок: страница материализованной ленты, затем посты
+    с нужными полями одним запросом."""
+    names = parse_fields(request, POST_FIELDS)
+    entries = TimelineEntry.objects.filter(user=request.user).only(
+        'post', 'pub_date')
+    paginator = CursorPaginator(
+        entries, _limit(request, POSTS_PER_PAGE), pk_field='post_id')
+    page = paginator.get_page(request.GET.get('cursor'))
+    found = restrict(
+        Post.objects.all(), names, POST_FIELDS, ('id', 'pub_date'),
+    ).in_bulk([entry.post_id for entry in page])
+    return JsonResponse({
+        'results': [
+            serialize(found[entry.post_id], names, POST_FIELDS)
+            for entry in page if entry.post_id in found
+        ],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+@query_budget(2)
+@api_view(['GET'])
+def post_detail(request, post_id):
+    names = parse_fields(request, POST_FIELDS)
+    post = archive.find_post(
+        post_id,
+        prepare=lambda queryset: restrict(queryset, names, POST_FIELDS))
+    if post is None:
+        raise Http404('Пост не найден.')
+    return JsonResponse(serialize(post, names, POST_FIELDS))
+
+
+@query_budget(2)
+@api_view(['GET'])
+def posts_batch(request):
+    """Несколько постов по ?ids=1,2,3 одним запросом, в порядке ids."""
+    names = parse_fields(request, POST_FIELDS)
+    try:
+        ids = [
+            int(value) for value in request.GET.get('ids', '').split(',')
+            if value.strip()
+        ]
+    except ValueError:
+        return error(400, 'ids — список целых чисел через запятую.')
+    if not ids or len(ids) > MAX_BATCH:
+        return error(400, f'Нужно от 1 до {MAX_BATCH} ids.')
+    found = restrict(Post.objects.all(), names, POST_FIELDS).in_bulk(ids)
+    return JsonResponse({
+        'results': [
+            serialize(found[pk], names, POST_FIELDS)
+            for pk in dict.fromkeys(ids) if pk in found
+        ],
+        'missing': [pk for pk in dict.fromkeys(ids) if pk not in found],
+    })
+
+
+@query_budget(8)
+@api_view(['GET', 'POST'], login=['POST'])
+def comments(request, post_id):
+    post = archive.find_post(
+        post_id, prepare=lambda queryset: queryset.only('pk'))
+    if post is None:
+        raise Http404('Пост не найден.')
+    if request.method == 'POST':
+        if post.is_archived:
+            return error(403, 'Архивный пост только для чтения.')
+        return _create_comment(request, post)
+    names = parse_fields(request, COMMENT_FIELDS)
+    # post_id нужен всегда: менеджер post.comments проставляет его
+    # каждому комментарию и без колонки дочитывал бы по одному.
+    queryset = restrict(
+        post.comments.all(), names, COMMENT_FIELDS,
+        ('id', 'post', 'created'))
+    paginator = CursorPaginator(
+        queryset,
+        _limit(request, COMMENTS_PER_PAGE),
+        date_field='created',
+        oldest_first=request.GET.get('order') != 'newest',
+    )
+    return JsonResponse(_page(paginator, request, names, COMMENT_FIELDS))
+
+
+def _create_comment(request, post):
+    try:
+        data, _ = _data(request)
+    except ValueError as exc:
+        return error(400, str(exc))
+    form = CommentForm(data)
+    if not form.is_valid():
+        return error(
+            400, 'Неверные данные.', errors=form.errors.get_json_data())
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    write_atomic(comment.save)
+    names = parse_fields(request, COMMENT_FIELDS)
+    return JsonResponse(
+        serialize(comment, names, COMMENT_FIELDS), status=201)
+
+
+@query_budget(18)
+@api_view(['POST', 'DELETE'], login=['POST', 'DELETE'])
+def follow(request, username):
+    """POST — подписаться, DELETE — отписаться. На себя подписаться
+    нельзя, как и на сайте."""
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    if request.method == 'DELETE':
+        write_atomic(Follow.objects.filter(
+            user=request.user, author=author).delete)
+        return HttpResponse(status=204)
+    if author.pk == request.user.pk:
+        return error(400, 'Нельзя подписаться на себя.')
+    _, created = write_atomic(lambda: Follow.objects.get_or_create(
+        user=request.user, author=author))
+    return JsonResponse(
+        {'author': username, 'following': True},
+        status=201 if created else 200)
@@ -0,0 +1,66 @@
+"""SQLite с настройками для одновременных чтений и записей.
+
+Стандартный бэкенд открывает базу в режиме журнала DELETE: пока идёт
+запись, читатели ждут, а транзакция, начатая обычным BEGIN, узнаёт
+о чужой записи только при первом изменении и сразу падает с
+«database is locked», не дожидаясь busy timeout.
+
+Здесь при каждом подключении включаются PRAGMAS (WAL — читатели не
+ждут писателя, mmap и кеш страниц, synchronous=NORMAL, busy timeout),
+а транзакции core.transactions.write_atomic начинаются с BEGIN
+IMMEDIATE: блокировка записи берётся сразу и ждёт своей очереди.
+Остальные transaction.atomic() — обычный BEGIN, чтобы блоки только
+для чтения не вставали в очередь за писателями; на репликах из
+DATABASE_REPLICAS тоже всегда обычный BEGIN. Переопределяется через
+OPTIONS (transaction_mode — режим для транзакций записи):
+
+    'OPTIONS': {
+        'pragmas': {'mmap_size': 0},
+        'transaction_mode': 'DEFERRED',
+    }
+"""
+from django.db.backends.sqlite3 import base
+
+from core.db_routing import replicas
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — в килобайтах: 64 МБ страниц на соединение.
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ставит write_atomic на время своей транзакции.
+        self.write_intent = False
+
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = {**PRAGMAS, **options.get('pragmas', {})}
+        self.transaction_mode = options.get('transaction_mode', 'IMMEDIATE')
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ValueError(
+                f'transaction_mode должен быть одним из {TRANSACTION_MODES}.')
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.write_intent and self.alias not in replicas():
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,348 @@
+"""Общий для всех процессов кеш в файле SQLite с тегами и бюджетом размера.
+
+LocMemCache живёт внутри одного процесса, поэтому каждый воркер держал
+свою копию фрагментов, и сброс кеша в одном воркере не доходил до других.
+Этот бэкенд хранит записи в одном файле SQLite (режим WAL), так что его
+видят все процессы на машине без отдельного сетевого сервиса.
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_SIZE': 64 * 1024 * 1024},
+        }
+    }
+
+Записи можно помечать тегами (``set(..., tags=[post_tag(post.pk)])``)
+и сбрасывать все записи тега одним вызовом ``invalidate_tags()``.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import record_cache
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 100000
+# Ключей в одном IN (?, …): старые сборки SQLite не принимают больше
+# 999 параметров в запросе.
+KEYS_PER_QUERY = 500
+
+
+def post_tag(pk):
+    return f'post:{pk}'
+
+
+def author_tag(pk):
+    return f'author:{pk}'
+
+
+def group_tag(pk):
+    return f'group:{pk}'
+
+
+class SQLiteCache(BaseCache):
+    """Кеш-бэкенд Django поверх файла SQLite.
+
+    При превышении MAX_SIZE (байт) сначала удаляются просроченные записи,
+    затем самые давно записанные, пока объём не опустится до
+    (1 - 1/CULL_FREQUENCY) от бюджета. Чтение ничего не пишет в файл,
+    чтобы попадания в кеш не брали блокировку записи.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._max_size = int(options.get('MAX_SIZE', DEFAULT_MAX_SIZE))
+        # Стандартные 300 записей BaseCache слишком мало для фрагментов
+        # на каждого пользователя; основной лимит здесь — MAX_SIZE.
+        self._max_entries = int(
+            options.get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        # sqlite3-соединение нельзя делить между потоками и переносить
+        # через fork, поэтому держим своё на каждый поток каждого процесса.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(
+            self._path, timeout=10, isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(
+            'CREATE TABLE IF NOT EXISTS cache_entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' value BLOB NOT NULL,'
+            ' expires REAL,'
+            ' size INTEGER NOT NULL,'
+            ' written REAL NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS cache_entries_written'
+            ' ON cache_entries (written);'
+            'CREATE INDEX IF NOT EXISTS cache_entries_expires'
+            ' ON cache_entries (expires);'
+            'CREATE TABLE IF NOT EXISTS cache_tags ('
+            ' tag TEXT NOT NULL,'
+            ' key TEXT NOT NULL,'
+            ' PRIMARY KEY (tag, key)) WITHOUT ROWID;'
+            'CREATE INDEX IF NOT EXISTS cache_tags_key ON cache_tags (key);'
+            # Итоги по записям ведут триггеры в той же транзакции, что
+            # и сама запись, так что бюджет проверяется чтением одной
+            # строки, а не проходом по всей таблице.
+            'CREATE TABLE IF NOT EXISTS cache_totals ('
+            ' id INTEGER PRIMARY KEY CHECK (id = 1),'
+            ' size INTEGER NOT NULL,'
+            ' count INTEGER NOT NULL);'
+            'INSERT OR IGNORE INTO cache_totals (id, size, count)'
+            ' SELECT 1, total(size), count(*) FROM cache_entries'
+            ' WHERE NOT EXISTS (SELECT 1 FROM cache_totals);'
+            'CREATE TRIGGER IF NOT EXISTS cache_entries_insert'
+            ' AFTER INSERT ON cache_entries BEGIN'
+            ' UPDATE cache_totals SET size = size + new.size,'
+            ' count = count + 1 WHERE id = 1; END;'
+            'CREATE TRIGGER IF NOT EXISTS cache_entries_delete'
+            ' AFTER DELETE ON cache_entries BEGIN'
+            ' UPDATE cache_totals SET size = size - old.size,'
+            ' count = count - 1 WHERE id = 1; END;'
+            'CREATE TRIGGER IF NOT EXISTS cache_entries_update'
+            ' AFTER UPDATE OF size ON cache_entries BEGIN'
+            ' UPDATE cache_totals SET size = size - old.size + new.size'
+            ' WHERE id = 1; END;'
+        )
+        # Без этого INSERT OR REPLACE удаляет старую запись, не вызывая
+        # триггер на удаление, и итоги расходятся с таблицей.
+        conn.execute('PRAGMA recursive_triggers=ON')
+        return conn
+
+    def _totals(self, conn):
+        return conn.execute(
+            'SELECT size, count FROM cache_totals WHERE id = 1').fetchone()
+
+    def _expiry(self, timeout):
+        # BaseCache уже переводит таймаут в абсолютное время истечения.
+        return self.get_backend_timeout(timeout)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        row = self._connection.execute(
+            'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            record_cache(misses=1)
+            return default
+        value, expires = row
+        if expires is not None and expires <= time.time():
+            record_cache(misses=1)
+            return default
+        record_cache(hits=1)
+        return pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        key_map = {self._key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        rows = []
+        for chunk in _chunks(list(key_map)):
+            placeholders = ', '.join('?' * len(chunk))
+            rows += self._connection.execute(
+                'SELECT key, value, expires FROM cache_entries'
+                f' WHERE key IN ({placeholders})', chunk,
+            ).fetchall()
+        now = time.time()
+        found = {
+            key_map[key]: pickle.loads(value)
+            for key, value, expires in rows
+            if expires is None or expires > now
+        }
+        record_cache(hits=len(found), misses=len(key_map) - len(found))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            tags=()):
+        self._store(key, value, timeout, version, tags, replace=True)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            tags=()):
+        return self._store(key, value, timeout, version, tags, replace=False)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None,
+                 tags=None):
+        """Все записи одной транзакцией и с одной проверкой бюджета.
+
+        tags — словарь {ключ: теги} для записей, которые нужно пометить.
+        """
+        tags = tags or {}
+        expires = self._expiry(timeout)
+        now = time.time()
+        conn = self._connection
+        with _transaction(conn):
+            for key, value in data.items():
+                self._insert(
+                    conn, self._key(key, version), value, expires, now,
+                    tags.get(key, ()))
+            if data:
+                self._cull(conn, now)
+        return []
+
+    def _store(self, key, value, timeout, version, tags, replace):
+        key = self._key(key, version)
+        now = time.time()
+        conn = self._connection
+        with _transaction(conn):
+            if not replace:
+                row = conn.execute(
+                    'SELECT expires FROM cache_entries WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and (row[0] is None or row[0] > now):
+                    return False
+            self._insert(conn, key, value, self._expiry(timeout), now, tags)
+            self._cull(conn, now)
+        return True
+
+    def _insert(self, conn, key, value, expires, now, tags):
+        data = pickle.dumps(value, self.pickle_protocol)
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entries'
+            ' (key, value, expires, size, written)'
+            ' VALUES (?, ?, ?, ?, ?)',
+            (key, data, expires, len(data), now),
+        )
+        conn.execute('DELETE FROM cache_tags WHERE key = ?', (key,))
+        conn.executemany(
+            'INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)',
+            [(tag, key) for tag in tags],
+        )
+
+    def _cull(self, conn, now):
+        total, count = self._totals(conn)
+        if total <= self._max_size and count <= self._max_entries:
+            return
+        self._delete_keys(conn, conn.execute(
+            'SELECT key FROM cache_entries WHERE expires <= ?', (now,)
+        ).fetchall())
+        target = self._max_size - self._max_size // self._cull_frequency
+        max_entries = (
+            self._max_entries - self._max_entries // self._cull_frequency)
+        total, count = self._totals(conn)
+        if total > target or count > max_entries:
+            # Самые давно записанные записи уходят первыми, пока
+            # и объём, и число записей не уложатся в бюджет.
+            self._delete_keys(conn, conn.execute(
+                'SELECT key FROM ('
+                ' SELECT key, sum(size) OVER (ORDER BY written DESC)'
+                '  AS running, row_number() OVER (ORDER BY written DESC)'
+                '  AS position FROM cache_entries)'
+                ' WHERE running > ? OR position > ?',
+                (target, max_entries),
+            ).fetchall())
+
+    def _delete_keys(self, conn, keys):
+        """Удаляет записи и их теги; keys — список кортежей (key,).
+
+        Теги удаляются по ключам через индекс cache_tags_key, без
+        прохода по всей таблице тегов.
+        """
+        conn.executemany('DELETE FROM cache_entries WHERE key = ?', keys)
+        conn.executemany('DELETE FROM cache_tags WHERE key = ?', keys)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._connection.execute(
+            'UPDATE cache_entries SET expires = ?'
+            ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expiry(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection.execute(
+            'SELECT 1 FROM cache_entries'
+            ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        conn = self._connection
+        with _transaction(conn):
+            cursor = conn.execute(
+                'DELETE FROM cache_entries WHERE key = ?', (key,))
+            conn.execute('DELETE FROM cache_tags WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.delete(key, version=version)
+
+    def invalidate_tags(self, *tags):
+        """Удаляет все записи, помеченные любым из тегов."""
+        if not tags:
+            return 0
+        conn = self._connection
+        keys = set()
+        with _transaction(conn):
+            for chunk in _chunks(list(tags)):
+                placeholders = ', '.join('?' * len(chunk))
+                keys.update(conn.execute(
+                    'SELECT key FROM cache_tags'
+                    f' WHERE tag IN ({placeholders})', chunk,
+                ))
+            self._delete_keys(conn, list(keys))
+        return len(keys)
+
+    def clear(self):
+        conn = self._connection
+        with _transaction(conn):
+            conn.execute('DELETE FROM cache_entries')
+            conn.execute('DELETE FROM cache_tags')
+
+    def close(self, **kwargs):
+        # Соединение держим открытым между запросами: открытие файла
+        # и PRAGMA дороже, чем сам запрос к кешу.
+        pass
+
+
+def _chunks(items, size=KEYS_PER_QUERY):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class _transaction:
+    """BEGIN IMMEDIATE … COMMIT: блокировка записи берётся сразу,
+    без повышения с shared-блокировки, на котором ловят SQLITE_BUSY."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
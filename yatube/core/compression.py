@@ -0,0 +1,168 @@
+"""Сжатие ответов brotli или gzip с повторным использованием результата.
+
+Закешированная главная отдаёт одни и те же байты тысячам запросов,
+и стандартный GZipMiddleware сжимал бы их заново каждый раз.
+CompressionMiddleware хранит сжатые тела в LRU процесса под ключом
+(кодировка, хеш тела): хеш считается на порядок быстрее сжатия, так что
+горячая страница сжимается один раз на воркер. Ключ зависит только от
+содержимого и устареть не может, поэтому общий кеш (и запись в его
+файл на каждый запрос) здесь не нужен.
+
+Кодировка выбирается по Accept-Encoding: brotli, если установлен пакет
+Brotli, иначе gzip. Потоковые ответы (в том числе server-sent events)
+сжимаются на лету со сбросом после каждого куска, чтобы клиент получал
+их без задержки. Уже сжатые ответы, файлы (FileResponse статики и
+media отдаются как есть, через sendfile), частичные (206) и несжимаемые
+типы проходят без изменений.
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.utils.cache import patch_vary_headers
+
+from .staticfiles import accepts, brotli
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+)
+# Как у GZipMiddleware: меньше этого сжатие не окупает заголовки.
+MIN_SIZE = 200
+GZIP_LEVEL = 6
+# Для ответов «на лету» — быстрое качество; статика сжата заранее с 11.
+BROTLI_QUALITY = 5
+CACHE_MAX_SIZE = 16 * 1024 * 1024
+
+
+class CompressedCache:
+    """LRU сжатых тел в памяти процесса с бюджетом в байтах."""
+
+    def __init__(self, max_size=CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        if len(data) > self.max_size:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+compressed_cache = CompressedCache()
+
+
+def gzip_compressor():
+    # wbits=31 — zlib пишет заголовок и хвост формата gzip.
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = gzip_compressor()
+    return compressor.compress(data) + compressor.flush()
+
+
+def compressed_body(data, encoding):
+    """Сжатое тело из LRU или, при промахе, сжатое сейчас."""
+    key = (encoding, hashlib.blake2b(data, digest_size=16).digest())
+    compressed = compressed_cache.get(key)
+    if compressed is None:
+        compressed = compress(data, encoding)
+        compressed_cache.set(key, compressed)
+    return compressed
+
+
+def _gzip_stream(chunks):
+    compressor = gzip_compressor()
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def negotiate(request):
+    """'br', 'gzip' или None — что принять клиенту из того, что умеем."""
+    if brotli is not None and accepts(request, 'br'):
+        return 'br'
+    if accepts(request, 'gzip'):
+        return 'gzip'
+    return None
+
+
+def is_compressible(response):
+    if response.has_header('Content-Encoding') or response.status_code == 206:
+        return False
+    # FileResponse статики и картинок: сжатые копии готовит collectstatic,
+    # а замена streaming_content отключила бы wsgi.file_wrapper (sendfile).
+    if getattr(response, 'file_to_stream', None) is not None:
+        return False
+    if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+        return False
+    return response.streaming or len(response.content) >= MIN_SIZE
+
+
+class CompressionMiddleware:
+    """Сжимает ответ; ставится выше всех, кто читает или меняет тело."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request)
+        if encoding is None:
+            return response
+        if response.streaming:
+            stream = _brotli_stream if encoding == 'br' else _gzip_stream
+            response.streaming_content = stream(response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = compressed_body(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        # Сжатое тело — другие байты: сильный ETag становится слабым,
+        # как в GZipMiddleware.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
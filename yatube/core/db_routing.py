@@ -0,0 +1,83 @@
+"""Чтение с реплик, запись в основную базу.
+
+ReplicaRoutingMiddleware разрешает реплики только view с безопасным
+методом (GET, HEAD, OPTIONS), и только если пользователь недавно ничего
+не писал. ReplicaRouter отправляет такие чтения на случайную реплику
+из settings.DATABASE_REPLICAS, а все записи, чтения внутри транзакции
+и любые запросы вне view — в default.
+
+Read-your-writes: запрос, который что-то записал, ставит cookie на
+REPLICA_PIN_SECONDS. Пока она жива, чтения пользователя идут в default:
+свой пост или комментарий он увидит, даже если реплика отстаёт.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Сессии меняются при каждом входе, а отставшая сессия разлогинит
+# пользователя, поэтому их читаем только из default.
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_local = threading.local()
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (not getattr(_local, 'replica_allowed', False)
+                or getattr(_local, 'wrote', False)
+                or model._meta.app_label in PRIMARY_ONLY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        aliases = replicas()
+        return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Все алиасы в DATABASES — одни и те же данные: default и его
+        # реплики (в том числе пока не включённые в DATABASE_REPLICAS).
+        pool = set(settings.DATABASES)
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики — копии default с той же схемой.
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает реплики на время view и закрепляет писавших за default."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.replica_allowed = (
+            request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES)
+        _local.wrote = False
+        try:
+            response = self.get_response(request)
+            wrote = _local.wrote
+        finally:
+            _local.replica_allowed = False
+            _local.wrote = False
+        if wrote and replicas():
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,186 @@
+"""Раздача загруженных картинок и миниатюр из MEDIA_ROOT.
+
+serve() проверяет доступ, а сами байты отдаёт фронтовой сервер:
+
+    MEDIA_ACCEL = 'x-accel-redirect'  # nginx, internal-location
+                                      # MEDIA_ACCEL_PREFIX → MEDIA_ROOT
+    MEDIA_ACCEL = 'x-sendfile'        # Apache mod_xsendfile, lighttpd
+
+Без фронтового сервера (MEDIA_ACCEL пусто) ответ — FileResponse:
+WSGI-сервер с wsgi.file_wrapper (gunicorn) отдаёт его через sendfile()
+без копирования в Python. Range отдаёт один диапазон (206) с тем же
+zero-copy: файл уже стоит на начале диапазона, а длину ограничивает
+Content-Length. ETag из времени изменения и размера, If-None-Match
+и If-Modified-Since дают 304, Cache-Control — долгий: загруженные
+файлы и миниатюры sorl не меняются на месте, новая версия — новое имя.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from django.views.static import was_modified_since
+
+# Каталоги MEDIA_ROOT, открытые всем: картинки постов и миниатюры sorl.
+# Остальное видят только сотрудники.
+PUBLIC_DIRS = ('posts', 'cache')
+MAX_AGE = 30 * 24 * 60 * 60
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Файл, который читается с позиции start не дальше length байт.
+
+    fileno() и tell() — от настоящего файла, так что sendfile() в
+    wsgi.file_wrapper начинает с нужного места, а read() для остальных
+    серверов не выходит за конец диапазона.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def has_access(request, path):
+    if request.user.is_staff:
+        return True
+    return path.split('/', 1)[0] in PUBLIC_DIRS
+
+
+def file_etag(stat):
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """(start, end) включительно, None — отдать файл целиком.
+
+    Несколько диапазонов сразу не поддерживаются: на них, как разрешает
+    RFC 7233, отвечаем всем файлом. Невыполнимый диапазон — ValueError.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _resolve(path):
+    path = posixpath.normpath(path).lstrip('/')
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    return path, fullpath
+
+
+def _set_cache_headers(response, etag, stat):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = f'public, max-age={MAX_AGE}'
+
+
+def _not_modified(request, etag, stat):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        # Для If-None-Match сравнение слабое: W/ не мешает совпадению.
+        tags = {tag.replace('W/', '', 1) for tag in parse_etags(if_none_match)}
+        return '*' in tags or etag in tags
+    return not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime, stat.st_size)
+
+
+def _range(request, etag, stat):
+    header = request.META.get('HTTP_RANGE')
+    if header is None:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is not None and if_range not in (
+            etag, http_date(stat.st_mtime)):
+        return None
+    return parse_range(header, stat.st_size)
+
+
+def serve(request, path):
+    """Картинка из MEDIA_ROOT после проверки доступа."""
+    path, fullpath = _resolve(path)
+    if not has_access(request, path):
+        raise Http404
+    stat = os.stat(fullpath)
+    etag = file_etag(stat)
+    if _not_modified(request, etag, stat):
+        response = HttpResponseNotModified()
+        _set_cache_headers(response, etag, stat)
+        return response
+    content_type = (
+        mimetypes.guess_type(fullpath)[0] or 'application/octet-stream')
+
+    accel = settings.MEDIA_ACCEL
+    if accel:
+        # Range и повторные проверки фронтовой сервер сделает сам.
+        response = HttpResponse(content_type=content_type)
+        if accel == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(
+                settings.MEDIA_ACCEL_PREFIX + path)
+        else:
+            response['X-Sendfile'] = fullpath
+        _set_cache_headers(response, etag, stat)
+        return response
+
+    try:
+        byte_range = _range(request, etag, stat)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    file = open(fullpath, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(
+            RangeFile(file, start, length), status=206,
+            content_type=content_type)
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    _set_cache_headers(response, etag, stat)
+    return response
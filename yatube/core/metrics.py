@@ -0,0 +1,211 @@
+"""Метрики запросов в памяти воркера в текстовом формате Prometheus.
+
+MetricsMiddleware для каждого запроса измеряет время ответа, число и
+время SQL-запросов, попадания и промахи кеша и размер ответа и копит их
+по имени URL (``posts:index``, ``posts:post_detail``…). На запрос это
+несколько вызовов perf_counter и одно обновление гистограмм под
+блокировкой; сами запросы к БД оборачиваются через execute_wrapper.
+
+Данные живут в процессе и сбрасываются при его перезапуске, каждый
+воркер отдаёт свои. Отдаются view core.views.metrics (только адресам из
+METRICS_ALLOWED_IPS).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.db import connections
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (
+    1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+UNRESOLVED = '<unresolved>'
+
+_local = threading.local()
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Последняя ячейка — значения больше самой верхней границы.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class ViewMetrics:
+    __slots__ = (
+        'duration', 'queries', 'size', 'db_time',
+        'cache_hits', 'cache_misses', 'responses',
+    )
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.responses = {}
+
+
+class RequestStats:
+    """Счётчики одного запроса; заодно execute_wrapper для БД."""
+
+    __slots__ = ('queries', 'db_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, status, duration, stats, size):
+        with self._lock:
+            metrics = self._views.get(view_name)
+            if metrics is None:
+                metrics = self._views[view_name] = ViewMetrics()
+            metrics.duration.observe(duration)
+            metrics.queries.observe(stats.queries)
+            if size is not None:
+                metrics.size.observe(size)
+            metrics.db_time += stats.db_time
+            metrics.cache_hits += stats.cache_hits
+            metrics.cache_misses += stats.cache_misses
+            metrics.responses[status] = metrics.responses.get(status, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus 0.0.4."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+            _histogram(
+                lines, views, 'duration', 'yatube_request_duration_seconds',
+                'Время обработки запроса.')
+            _histogram(
+                lines, views, 'queries', 'yatube_request_db_queries',
+                'Число SQL-запросов на запрос.')
+            _counter(
+                lines, views, 'db_time', 'yatube_db_query_seconds_total',
+                'Суммарное время SQL-запросов.')
+            _counter(
+                lines, views, 'cache_hits', 'yatube_cache_hits_total',
+                'Попадания в кеш.')
+            _counter(
+                lines, views, 'cache_misses', 'yatube_cache_misses_total',
+                'Промахи кеша.')
+            _histogram(
+                lines, views, 'size', 'yatube_response_size_bytes',
+                'Размер тела ответа.')
+            lines.append(
+                '# HELP yatube_responses_total Ответы по коду статуса.')
+            lines.append('# TYPE yatube_responses_total counter')
+            for name, metrics in views:
+                for status, count in sorted(metrics.responses.items()):
+                    lines.append(
+                        f'yatube_responses_total{{view="{_escape(name)}",'
+                        f'status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+
+
+def _histogram(lines, views, attr, metric, help_text):
+    lines.append(f'# HELP {metric} {help_text}')
+    lines.append(f'# TYPE {metric} histogram')
+    for name, metrics in views:
+        histogram = getattr(metrics, attr)
+        label = f'view="{_escape(name)}"'
+        for bound, total in histogram.cumulative():
+            lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {total}')
+        lines.append(f'{metric}_sum{{{label}}} {histogram.sum}')
+        lines.append(f'{metric}_count{{{label}}} {histogram.count}')
+
+
+def _counter(lines, views, attr, metric, help_text):
+    lines.append(f'# HELP {metric} {help_text}')
+    lines.append(f'# TYPE {metric} counter')
+    for name, metrics in views:
+        lines.append(
+            f'{metric}{{view="{_escape(name)}"}} {getattr(metrics, attr)}')
+
+
+registry = Registry()
+
+
+def record_cache(hits=0, misses=0):
+    """Учитывает обращение к кешу в текущем запросе (вне запроса — no-op)."""
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.view_name:
+        return UNRESOLVED
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса; ставится первым в MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        _local.stats = stats
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        duration = time.perf_counter() - start
+        # У потокового ответа размер заранее неизвестен.
+        size = None if response.streaming else len(response.content)
+        registry.record(
+            view_name(request), response.status_code, duration, stats, size)
+        return response
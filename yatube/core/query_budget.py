@@ -0,0 +1,53 @@
+"""Бюджет SQL-запросов на view.
+
+@query_budget(n) считает запросы, которые view (вместе с рендером
+шаблона) выполняет через все соединения — и default, и реплики из
+DATABASE_REPLICAS, куда роутер отправляет чтения. При превышении бюджета
+пишет предупреждение в лог, а при QUERY_BUDGET_RAISE = True бросает
+QueryBudgetExceeded — так N+1 в шаблонах ловится тестами, а не в проде.
+"""
+import functools
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def query_budget(budget):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                response = view(request, *args, **kwargs)
+            request.query_count = counter.count
+            if counter.count > budget:
+                message = (
+                    f'{view.__module__}.{view.__name__}: '
+                    f'{counter.count} SQL-запросов при бюджете {budget}'
+                )
+                if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        wrapper.query_budget = budget
+        return wrapper
+    return decorator
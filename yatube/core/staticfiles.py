@@ -0,0 +1,152 @@
+"""Статика с хешем в имени, заранее сжатая gzip и brotli.
+
+CompressedManifestStaticFilesStorage — ManifestStaticFilesStorage,
+который после collectstatic кладёт рядом с каждым файлом с хешем
+в имени (app.3f2a1b4c5d6e.css) сжатые копии app.3f2a1b4c5d6e.css.gz
+и .br. {% static %} сам подставляет имена с хешем, поэтому такие файлы
+можно кешировать навсегда: новая версия получит новое имя.
+
+serve() отдаёт STATIC_ROOT, если запрос до Django всё-таки дошёл:
+выбирает готовую сжатую копию по Accept-Encoding, ничего не сжимая
+на лету, и ставит Cache-Control immutable для имён с хешем. Для nginx
+то же дают gzip_static и brotli_static.
+
+brotli — необязательная зависимость: без пакета Brotli пишутся и
+отдаются только .gz.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml',
+    '.ico', '.ttf', '.otf', '.eot',
+)
+# Мелкие файлы сжатие почти не уменьшает, а запрос всё равно один.
+MIN_SIZE = 256
+# Имя с хешем ManifestStaticFilesStorage: 12 hex-символов перед
+# расширением.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MAX_AGE = 60
+
+
+def _gzip(data):
+    # mtime=0 — одинаковые файлы дают одинаковые байты на всех серверах.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+def encodings():
+    """[(Content-Encoding, суффикс файла, функция сжатия)] по приоритету."""
+    available = [('gzip', '.gz', _gzip)]
+    if brotli is not None:
+        available.insert(0, ('br', '.br', _brotli))
+    return available
+
+
+def compress_file(path):
+    """Пишет сжатые копии файла; возвращает пути записанных копий."""
+    if not path.endswith(COMPRESSIBLE):
+        return []
+    with open(path, 'rb') as source:
+        data = source.read()
+    if len(data) < MIN_SIZE:
+        return []
+    written = []
+    for encoding, suffix, compress in encodings():
+        compressed = compress(data)
+        if len(compressed) >= len(data):
+            continue
+        with open(path + suffix, 'wb') as target:
+            target.write(compressed)
+        written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        # Файл проходит post_process несколько раз, сжимаем итоговую
+        # версию один раз.
+        for hashed_name in hashed_names:
+            compress_file(self.path(hashed_name))
+
+
+def accepts(request, encoding):
+    """Принимает ли клиент Content-Encoding encoding (q > 0)."""
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for part in header.split(','):
+        token, _, params = part.partition(';')
+        if token.strip().lower() not in (encoding, '*'):
+            continue
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def serve(request, path):
+    """Файл из STATIC_ROOT, по возможности уже сжатый."""
+    try:
+        fullpath = safe_join(
+            settings.STATIC_ROOT, posixpath.normpath(path).lstrip('/'))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    stat = os.stat(fullpath)
+    if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size):
+        return HttpResponseNotModified()
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_encoding = None
+    filename = fullpath
+    for encoding, suffix, _ in encodings():
+        if accepts(request, encoding) and os.path.isfile(fullpath + suffix):
+            content_encoding = encoding
+            filename = fullpath + suffix
+            break
+    response = FileResponse(
+        open(filename, 'rb'),
+        content_type=content_type or 'application/octet-stream')
+    if content_encoding:
+        response['Content-Encoding'] = content_encoding
+    response['Vary'] = 'Accept-Encoding'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if HASHED_NAME.search(path):
+        response['Cache-Control'] = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+    else:
+        response['Cache-Control'] = f'public, max-age={MAX_AGE}'
+    return response
@@ -0,0 +1,163 @@
+"""Профилировщик рендера шаблонов, включаемый на один запрос.
+
+Запрос с ?profile_templates с адреса из TEMPLATE_PROFILER_ALLOWED_IPS
+рендерится с замером каждого шаблона по имени (в том числе
+подключённых через include и extends), каждого тега ({% url %}, {% cache %},
+{% thumbnail %}, {% post_cards %} и т. д.) и каждой переменной
+с фильтрами ({{ field|addclass:... }}). Итог уходит в заголовок
+Server-Timing (видно во вкладке Network браузера), а
+?profile_templates=text вместо страницы отдаёт текстовый отчёт.
+
+«Своё» время узла — без вложенных узлов, поэтому сумма по колонке
+«своё» равна времени рендера. «Всего» включает вложенные узлы и для
+рекурсивных тегов (for внутри for) считает вложенный вызов дважды.
+
+Замер подменяет Node.render_annotated и Template._render один раз при
+создании middleware; без включённого профиля обёртка стоит одну
+проверку thread-local.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.base import Node, Template, TextNode, VariableNode
+
+PARAMETER = 'profile_templates'
+REPORT_LIMIT = 30
+SERVER_TIMING_LIMIT = 10
+
+_local = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+
+
+class Entry:
+    __slots__ = ('calls', 'total', 'own')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.own = 0.0
+
+
+class Profile:
+    """Время рендера по шаблонам и тегам в рамках одного профиля."""
+
+    def __init__(self):
+        self.entries = defaultdict(Entry)
+        self._children = []
+
+    def measure(self, label, render, *args):
+        self._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return render(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            entry = self.entries[label]
+            entry.calls += 1
+            entry.total += elapsed
+            entry.own += elapsed - children
+
+    def top(self, limit=REPORT_LIMIT):
+        """[(метка, Entry)] по убыванию собственного времени."""
+        ranked = sorted(
+            self.entries.items(), key=lambda item: item[1].own, reverse=True)
+        return ranked[:limit]
+
+    def report(self, limit=REPORT_LIMIT):
+        lines = [f'{"своё, мс":>10} {"всего, мс":>10} {"вызовов":>8}  узел']
+        for label, entry in self.top(limit):
+            lines.append(
+                f'{entry.own * 1000:10.2f} {entry.total * 1000:10.2f}'
+                f' {entry.calls:8d}  {label}')
+        return '\n'.join(lines) + '\n'
+
+    def server_timing(self, limit=SERVER_TIMING_LIMIT):
+        return ', '.join(
+            f'tpl{number};desc="{label.replace(chr(34), chr(39))}"'
+            f';dur={entry.own * 1000:.2f}'
+            for number, (label, entry) in enumerate(self.top(limit)))
+
+
+def node_label(node):
+    """{% url %}, {{ |date }} — чем был узел в исходном шаблоне."""
+    if isinstance(node, VariableNode):
+        filters = node.filter_expression.filters
+        names = '|'.join(func.__name__ for func, args in filters)
+        return '{{ |%s }}' % names if names else '{{ }}'
+    token = getattr(node, 'token', None)
+    if token is None or not token.contents:
+        return type(node).__name__
+    return '{%% %s %%}' % token.contents.split()[0]
+
+
+def _profile():
+    return getattr(_local, 'profile', None)
+
+
+def install():
+    """Оборачивает рендер узлов и шаблонов замером (один раз на процесс)."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        render_annotated = Node.render_annotated
+        render_template = Template._render
+
+        def profiled_render_annotated(self, context):
+            profile = _profile()
+            if profile is None or isinstance(self, TextNode):
+                return render_annotated(self, context)
+            return profile.measure(
+                node_label(self), render_annotated, self, context)
+
+        def profiled_render_template(self, context):
+            profile = _profile()
+            if profile is None:
+                return render_template(self, context)
+            return profile.measure(
+                self.name or '<template>', render_template, self, context)
+
+        Node.render_annotated = profiled_render_annotated
+        Template._render = profiled_render_template
+        _installed = True
+
+
+@contextmanager
+def profiling():
+    """with profiling() as profile: ... — замер рендера в этом потоке."""
+    install()
+    profile = Profile()
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = None
+
+
+class TemplateProfilerMiddleware:
+    """Включает профиль для запросов с ?profile_templates."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        mode = request.GET.get(PARAMETER)
+        if mode is None or request.META.get('REMOTE_ADDR') not in (
+                settings.TEMPLATE_PROFILER_ALLOWED_IPS):
+            return self.get_response(request)
+        with profiling() as profile:
+            response = self.get_response(request)
+        if mode == 'text':
+            return HttpResponse(
+                profile.report(), content_type='text/plain; charset=utf-8')
+        response['Server-Timing'] = profile.server_timing()
+        return response
@@ -0,0 +1,15 @@
+from django import template
+
+from core.thumbnails import cached_thumbnail as lookup_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag(name='cached_thumbnail')
+def cached_thumbnail(image, geometry_string, post_id=None, **options):
+    """{% cached_thumbnail post.image "960x339" post.pk crop="center"
+    as im %}
+
+    Только ищет готовую миниатюру; если её ещё нет, возвращает None.
+    """
+    return lookup_thumbnail(image, geometry_string, post_id, **options)
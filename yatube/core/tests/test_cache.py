@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from ..cache import KEYS_PER_QUERY, SQLiteCache, author_tag, post_tag
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_SIZE': 4096},
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        """Базовые операции кеша"""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expired_entry_is_missing(self):
+        """Просроченная запись не возвращается"""
+        self.cache.set('key', 'value', timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'value'))
+
+    def test_shared_between_instances(self):
+        """Запись видна другому экземпляру с тем же файлом,
+        как другому процессу"""
+        self.cache.set('key', 'value')
+        other = SQLiteCache(self.path, {})
+        self.assertEqual(other.get('key'), 'value')
+
+    def test_invalidate_tags(self):
+        """Сброс тега удаляет все его записи и только их"""
+        self.cache.set('post', 1, tags=[post_tag(1)])
+        self.cache.set('feed', 2, tags=[post_tag(1), author_tag(7)])
+        self.cache.set('other', 3, tags=[author_tag(8)])
+
+        self.assertEqual(self.cache.invalidate_tags(post_tag(1)), 2)
+
+        self.assertEqual(
+            self.cache.get_many(['post', 'feed', 'other']), {'other': 3})
+
+    def test_size_budget_evicts_oldest(self):
+        """При превышении бюджета вытесняются самые старые записи"""
+        for i in range(10):
+            self.cache.set(f'key{i}', b'x' * 1000)
+        self.assertIsNone(self.cache.get('key0'))
+        self.assertIsNotNone(self.cache.get('key9'))
+
+    def test_totals_follow_every_write(self):
+        """Итоги объёма и числа записей совпадают с таблицей
+        после записи, замены, удаления и сброса тегов"""
+        conn = self.cache._connection
+
+        def assert_totals():
+            self.assertEqual(
+                tuple(self.cache._totals(conn)),
+                tuple(conn.execute(
+                    'SELECT total(size), count(*) FROM cache_entries'
+                ).fetchone()),
+            )
+
+        self.cache.set('a', b'x' * 100, tags=[post_tag(1)])
+        self.cache.set('b', b'y' * 200)
+        assert_totals()
+        self.cache.set('a', b'z' * 10)
+        assert_totals()
+        self.cache.delete('b')
+        assert_totals()
+        self.cache.set('c', b'c', tags=[post_tag(2)])
+        self.cache.invalidate_tags(post_tag(2))
+        assert_totals()
+        for i in range(10):
+            self.cache.set(f'key{i}', b'x' * 1000)
+        assert_totals()
+        self.cache.clear()
+        self.assertEqual(tuple(self.cache._totals(conn)), (0, 0))
+
+    def test_set_many_with_tags(self):
+        """set_many пишет записи с их тегами одной транзакцией"""
+        self.cache.set_many(
+            {'a': 1, 'b': 2, 'c': 3},
+            tags={'a': [post_tag(1)], 'b': [post_tag(1), author_tag(2)]})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(self.cache.invalidate_tags(post_tag(1)), 2)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 3})
+
+    def test_get_many_in_chunks(self):
+        """get_many с тысячами ключей разбивает IN на несколько запросов"""
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_SIZE': 10 ** 7}})
+        keys = [f'key{i}' for i in range(KEYS_PER_QUERY * 2 + 1)]
+        cache.set_many({key: key for key in keys})
+        statements = []
+        cache._connection.set_trace_callback(statements.append)
+        found = cache.get_many(keys + ['missing'])
+        self.assertEqual(found, {key: key for key in keys})
+        self.assertEqual(len(statements), 3)
+
+    def test_cull_drops_tags_of_culled_keys(self):
+        """Вытеснение удаляет теги вытесненных записей и только их"""
+        self.cache.set('expired', b'e', timeout=-1, tags=[post_tag(1)])
+        for i in range(10):
+            self.cache.set(f'key{i}', b'x' * 1000, tags=[post_tag(2)])
+        conn = self.cache._connection
+        tagged = {key for key, in conn.execute('SELECT key FROM cache_tags')}
+        stored = {
+            key for key, in conn.execute('SELECT key FROM cache_entries')}
+        self.assertEqual(tagged, stored)
+        self.assertNotIn('expired', stored)
+        self.assertIn(self.cache.make_key('key9'), stored)
+
+    def test_cull_uses_expires_index(self):
+        """Поиск просроченных записей идёт по индексу на expires"""
+        plan = ' '.join(row[-1] for row in self.cache._connection.execute(
+            'EXPLAIN QUERY PLAN'
+            ' SELECT key FROM cache_entries WHERE expires <= ?', (0,)))
+        self.assertIn('cache_entries_expires', plan)
+
+    def test_tests_use_own_cache_file(self):
+        """Тесты пишут во временный файл кеша, а не в общий из BASE_DIR"""
+        location = settings.CACHES['default']['LOCATION']
+        self.assertNotEqual(
+            os.path.dirname(location), str(settings.BASE_DIR))
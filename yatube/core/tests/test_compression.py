@@ -0,0 +1,142 @@
+import gzip
+import tempfile
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import compression
+from ..compression import CompressedCache, CompressionMiddleware
+
+User = get_user_model()
+BODY = b'<p>' + b'Yatube ' * 200 + b'</p>'
+
+
+def middleware(response):
+    return CompressionMiddleware(lambda request: response)
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        compression.compressed_cache.clear()
+        self.request = RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING='gzip')
+
+    def test_gzip_response(self):
+        """HTML сжимается gzip, сильный ETag становится слабым"""
+        response = HttpResponse(BODY)
+        response['ETag'] = '"abc"'
+        response = middleware(response)(self.request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_passthrough(self):
+        """Без Accept-Encoding, мелкие, уже сжатые и картинки — как есть"""
+        encoded = HttpResponse(BODY)
+        encoded['Content-Encoding'] = 'br'
+        cases = [
+            (RequestFactory().get('/'), HttpResponse(BODY)),
+            (self.request, HttpResponse(b'<p>short</p>')),
+            (self.request, HttpResponse(BODY, content_type='image/png')),
+            (self.request, HttpResponse(BODY, status=206)),
+            (self.request, encoded),
+        ]
+        for request, response in cases:
+            with self.subTest(response=response):
+                content = response.content
+                response = middleware(response)(request)
+                self.assertEqual(response.content, content)
+                self.assertNotEqual(response.get('Content-Encoding'), 'gzip')
+
+    def test_file_response_passthrough(self):
+        """Файл статики без сжатой копии уходит как есть, через sendfile"""
+        with tempfile.NamedTemporaryFile(suffix='.css') as file:
+            file.write(BODY)
+            file.flush()
+            response = FileResponse(
+                open(file.name, 'rb'), content_type='text/css')
+            stream = response.file_to_stream
+            response = middleware(response)(self.request)
+            self.assertIs(response.file_to_stream, stream)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(b''.join(response.streaming_content), BODY)
+            response.close()
+
+    def test_identical_body_compressed_once(self):
+        """Повторное одинаковое тело берётся из LRU, без сжатия"""
+        with mock.patch.object(
+                compression, 'compress', wraps=compression.compress) as spy:
+            first = middleware(HttpResponse(BODY))(self.request).content
+            second = middleware(HttpResponse(BODY))(self.request).content
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_streaming_flushes_each_chunk(self):
+        """Каждый кусок потока приходит клиенту сразу после сжатия"""
+        chunks = [b'data: 1\n\n', b'data: 2\n\n']
+        response = StreamingHttpResponse(
+            iter(chunks), content_type='text/event-stream')
+        response = middleware(response)(self.request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        stream = iter(response.streaming_content)
+        decompressor = compression.zlib.decompressobj(31)
+        for chunk in chunks:
+            self.assertEqual(decompressor.decompress(next(stream)), chunk)
+        decompressor.decompress(b''.join(stream))
+        self.assertTrue(decompressor.eof)
+
+    @skipUnless(compression.brotli, 'нет пакета Brotli')
+    def test_brotli_preferred(self):
+        """brotli выбирается, когда клиент его принимает"""
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        response = middleware(HttpResponse(BODY))(request)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), BODY)
+
+
+class CompressedCacheTest(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        """При превышении бюджета вытесняется давно не читанное"""
+        lru = CompressedCache(max_size=10)
+        lru.set('a', b'1234')
+        lru.set('b', b'1234')
+        lru.get('a')
+        lru.set('c', b'1234')
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), b'1234')
+        lru.set('huge', b'x' * 11)
+        self.assertIsNone(lru.get('huge'))
+
+
+class CachedIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = User.objects.create_user(username='auth')
+        for number in range(5):
+            Post.objects.create(author=user, text=f'Тестовый пост {number}')
+
+    def test_cached_index_compressed_once(self):
+        """Закешированная главная сжимается один раз на процесс"""
+        cache.clear()
+        compression.compressed_cache.clear()
+        with mock.patch.object(
+                compression, 'compress', wraps=compression.compress) as spy:
+            bodies = [
+                self.client.get(
+                    reverse('posts:main_page'),
+                    HTTP_ACCEPT_ENCODING='gzip').content
+                for _ in range(3)
+            ]
+        self.assertEqual(spy.call_count, 1)
+        self.assertIn(
+            'Тестовый пост 4', gzip.decompress(bodies[-1]).decode())
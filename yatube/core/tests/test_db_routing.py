@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Post
+from ..db_routing import PIN_COOKIE, ReplicaRouter
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    """default и replica — две отдельные базы SQLite. Реплика «отстаёт»:
+    в неё попадает только то, что тест запишет туда явно."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        for alias in ('default', 'replica'):
+            author = User.objects.db_manager(alias).create_user(
+                username='author', id=1)
+            Post.objects.using(alias).create(
+                author=author, text='Пост на обеих базах')
+        self.author = User.objects.get(username='author')
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_reads_go_to_replica(self):
+        """Страницы читают реплику: пост, которого там нет, не виден"""
+        Post.objects.create(author=self.author, text='Только в default')
+        response = self.guest.get(reverse('posts:main_page'))
+        self.assertContains(response, 'Пост на обеих базах')
+        self.assertNotContains(response, 'Только в default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_author_sees_own_post(self):
+        """После записи автор читает default, пока жива cookie"""
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Свежий пост'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertFalse(
+            Post.objects.using('replica').filter(text='Свежий пост').exists())
+
+        url = reverse('posts:main_page')
+        self.assertContains(self.client.get(url), 'Свежий пост')
+        self.assertNotContains(self.guest.get(url), 'Свежий пост')
+
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertNotContains(self.client.get(url), 'Свежий пост')
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_outside_views_use_default(self):
+        """Вне view (команды, сигналы) чтения идут в default"""
+        self.assertEqual(ReplicaRouter().db_for_read(Post), 'default')
+        self.assertEqual(ReplicaRouter().db_for_write(Post), 'default')
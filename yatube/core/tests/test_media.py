@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..media import parse_range
+
+User = get_user_model()
+IMAGE = bytes(range(256)) * 4
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_ACCEL='')
+class MediaServeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for directory, name in (('posts', 'small.gif'), ('private', 'a.gif')):
+            os.makedirs(os.path.join(MEDIA_ROOT, directory), exist_ok=True)
+            with open(os.path.join(MEDIA_ROOT, directory, name), 'wb') as file:
+                file.write(IMAGE)
+        cls.url = '/media/posts/small.gif'
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_full_file_with_cache_headers(self):
+        """Файл целиком, с ETag, Accept-Ranges и долгим кешем"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Content-Length'], str(len(IMAGE)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertEqual(b''.join(response.streaming_content), IMAGE)
+
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range(self):
+        """Range отдаёт только запрошенные байты со статусом 206"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(
+            response['Content-Range'], f'bytes 10-19/{len(IMAGE)}')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join(response.streaming_content), IMAGE[10:20])
+
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"устарел"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_access(self):
+        """Закрытые каталоги и выход из MEDIA_ROOT — 404"""
+        for url in ('/media/private/a.gif', '/media/../settings.py',
+                    '/media/posts/missing.gif'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/media/private/a.gif')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MEDIA_ACCEL='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        """С nginx Django отдаёт только заголовок X-Accel-Redirect"""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/small.gif')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+    @override_settings(MEDIA_ACCEL='x-sendfile')
+    def test_x_sendfile(self):
+        """С Apache — X-Sendfile с полным путём файла"""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(MEDIA_ROOT, 'posts', 'small.gif'))
+
+
+class ParseRangeTest(SimpleTestCase):
+    def test_forms(self):
+        """bytes=a-b, bytes=a- и bytes=-n; несколько диапазонов — весь файл"""
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=990-2000', 1000), (990, 999))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000))
+        self.assertIsNone(parse_range('items=0-1', 1000))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=1000-', 1000)
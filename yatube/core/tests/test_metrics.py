@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..metrics import DURATION_BUCKETS, Histogram, registry
+
+User = get_user_model()
+
+
+class HistogramTest(TestCase):
+    def test_cumulative_buckets(self):
+        """Ячейки гистограммы накопительные, +Inf равна числу значений"""
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 7):
+            histogram.observe(value)
+        self.assertEqual(
+            list(histogram.cumulative()), [(1, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual(histogram.sum, 11)
+        self.assertEqual(histogram.count, 4)
+
+
+class MetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_recorded_by_url_name(self):
+        """Время, запросы к БД, кеш и размер ответа копятся по имени URL"""
+        response = self.client.get(reverse('posts:main_page'))
+        self.client.get(reverse('posts:main_page'))
+        text = self.metrics()
+        label = 'view="posts:main_page"'
+        self.assertIn(
+            f'yatube_request_duration_seconds_count{{{label}}} 2', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            f'{{{label},le="{DURATION_BUCKETS[-1]}"}} 2', text)
+        self.assertIn(
+            f'yatube_responses_total{{{label},status="200"}} 2', text)
+        self.assertIn(
+            f'yatube_response_size_bytes_sum{{{label}}} '
+            f'{2 * len(response.content)}', text)
+        # Первый рендер промахивается мимо кеша ленты, второй попадает.
+        self.assertIn(f'yatube_cache_misses_total{{{label}}}', text)
+        self.assertNotIn(f'yatube_cache_hits_total{{{label}}} 0\n', text)
+        self.assertNotIn(f'yatube_request_db_queries_sum{{{label}}} 0\n', text)
+
+    def test_unresolved_path(self):
+        """Несуществующие адреса копятся под одной меткой"""
+        self.client.get('/no-such-page/')
+        self.assertIn(
+            'yatube_responses_total{view="<unresolved>",status="404"} 1',
+            self.metrics())
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_endpoint_hidden_from_other_addresses(self):
+        """Метрики отдаются только разрешённым адресам"""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,106 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.db import OperationalError, connection, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..backends.sqlite3.base import DatabaseWrapper
+from ..transactions import write_atomic
+
+
+def file_connection(path, **options):
+    return DatabaseWrapper({
+        **connection.settings_dict,
+        'NAME': path,
+        'OPTIONS': options,
+    }, 'benchmark')
+
+
+class SQLiteBackendTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """WAL, synchronous=NORMAL, mmap и busy timeout — у каждого
+        нового соединения"""
+        wrapper = file_connection(self.path)
+        self.addCleanup(wrapper.close)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(
+            self.pragma(wrapper, 'mmap_size'), 256 * 1024 * 1024)
+
+    def test_options_override(self):
+        """OPTIONS переопределяют PRAGMA и режим транзакций"""
+        wrapper = file_connection(
+            self.path, pragmas={'journal_mode': 'DELETE'},
+            transaction_mode='DEFERRED')
+        self.addCleanup(wrapper.close)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(wrapper.transaction_mode, 'DEFERRED')
+        with self.assertRaises(ValueError):
+            file_connection(self.path, transaction_mode='LAZY').connect()
+
+
+class WriteAtomicTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def first_statement(self, alias, block):
+        with CaptureQueriesContext(connections[alias]) as queries:
+            block()
+        return queries.captured_queries[0]['sql']
+
+    def test_transactions_begin_immediate(self):
+        """Транзакция write_atomic сразу берёт блокировку записи"""
+        self.assertEqual(
+            self.first_statement('default', lambda: write_atomic(
+                lambda: connection.cursor().execute('SELECT 1'))),
+            'BEGIN IMMEDIATE')
+        self.assertFalse(connection.write_intent)
+
+    def test_plain_atomic_begins_deferred(self):
+        """Обычный atomic() — обычный BEGIN: чтение не ждёт писателей"""
+        def read():
+            with transaction.atomic():
+                connection.cursor().execute('SELECT 1')
+
+        self.assertEqual(self.first_statement('default', read), 'BEGIN')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_replica_never_immediate(self):
+        """На реплике и write_atomic начинается обычным BEGIN"""
+        replica = connections['replica']
+        self.assertEqual(
+            self.first_statement('replica', lambda: write_atomic(
+                lambda: replica.cursor().execute('SELECT 1'),
+                using='replica')),
+            'BEGIN')
+
+    @mock.patch('core.transactions.time.sleep')
+    def test_retries_when_locked(self, sleep):
+        """«database is locked» повторяет транзакцию целиком"""
+        func = mock.Mock(side_effect=[
+            OperationalError('database is locked'), 'готово'])
+        self.assertEqual(write_atomic(func), 'готово')
+        self.assertEqual(func.call_count, 2)
+        sleep.assert_called_once()
+
+        func = mock.Mock(side_effect=OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            write_atomic(func)
+        self.assertEqual(func.call_count, 1)
+
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            write_atomic(func, retries=2)
+        self.assertEqual(func.call_count, 3)
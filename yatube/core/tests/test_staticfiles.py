@@ -0,0 +1,95 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.http import Http404
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import staticfiles
+
+STYLE = b'.post { margin: 0 auto; }\n' * 100
+
+
+class StaticPipelineTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.source, 'css'))
+        with open(os.path.join(cls.source, 'css', 'app.css'), 'wb') as file:
+            file.write(STYLE)
+        with open(os.path.join(cls.source, 'tiny.txt'), 'wb') as file:
+            file.write(b'ok')
+        cls.settings = override_settings(
+            STATICFILES_DIRS=[cls.source],
+            STATIC_ROOT=cls.root,
+            STATICFILES_STORAGE=(
+                'core.staticfiles.CompressedManifestStaticFilesStorage'),
+        )
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+        cls.url = Template(
+            "{% load static %}{% static 'css/app.css' %}").render(Context())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.source)
+        shutil.rmtree(cls.root)
+        super().tearDownClass()
+
+    def test_hashed_name_and_compressed_siblings(self):
+        """{% static %} даёт имя с хешем, рядом лежит сжатая копия"""
+        self.assertRegex(self.url, r'^/static/css/app\.[0-9a-f]{12}\.css$')
+        path = os.path.join(self.root, self.url[len('/static/'):])
+        with gzip.open(path + '.gz') as file:
+            self.assertEqual(file.read(), STYLE)
+        self.assertEqual(os.path.isfile(path + '.br'),
+                         staticfiles.brotli is not None)
+        tiny = Template(
+            "{% load static %}{% static 'tiny.txt' %}").render(Context())
+        path = os.path.join(self.root, tiny[len('/static/'):])
+        self.assertFalse(os.path.exists(path + '.gz'))
+
+    def test_serves_precompressed_file(self):
+        """Сжатая копия отдаётся как есть, с immutable и Vary"""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        body = b''.join(response.streaming_content)
+        self.assertEqual(gzip.decompress(body), STYLE)
+
+    def test_identity_and_unhashed(self):
+        """Без Accept-Encoding — исходный файл; без хеша — короткий кеш"""
+        response = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), STYLE)
+
+        response = self.client.get('/static/css/app.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+        # Файл без сжатой копии не сжимается и на лету.
+        response = self.client.get(
+            '/static/tiny.txt', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response.close()
+
+        request = RequestFactory().get('/static/../settings.py')
+        with self.assertRaises(Http404):
+            staticfiles.serve(request, '../settings.py')
+
+    @skipUnless(staticfiles.brotli, 'нет пакета Brotli')
+    def test_prefers_brotli(self):
+        """brotli выбирается раньше gzip, если клиент его принимает"""
+        response = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
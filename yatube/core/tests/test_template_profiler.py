@@ -0,0 +1,89 @@
+import importlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..template_profiler import profiling
+
+User = get_user_model()
+
+
+class ProfileTest(SimpleTestCase):
+    def test_time_attributed_to_tags_and_filters(self):
+        """Время рендера раскладывается по тегам, фильтрам и шаблонам"""
+        template = Template(
+            '{% for i in items %}'
+            '<a href="{% url "posts:main_page" %}">{{ i|add:1 }}</a>'
+            '{% endfor %}')
+        with profiling() as profile:
+            template.render(Context({'items': range(3)}))
+        entries = profile.entries
+        self.assertEqual(entries['{% for %}'].calls, 1)
+        self.assertEqual(entries['{% url %}'].calls, 3)
+        self.assertEqual(entries['{{ |add }}'].calls, 3)
+        self.assertEqual(entries['<template>'].calls, 1)
+        # Своё время узлов в сумме равно времени всего рендера.
+        total = sum(entry.own for entry in entries.values())
+        self.assertAlmostEqual(
+            total, entries['<template>'].total, places=6)
+        self.assertIn('{% url %}', profile.report())
+
+    def test_inactive_outside_profile(self):
+        """Без профиля рендер ничего не записывает"""
+        with profiling() as profile:
+            pass
+        Template('{% url "posts:main_page" %}').render(Context())
+        self.assertFalse(profile.entries)
+
+
+class TemplateProfilerMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = User.objects.create_user(username='auth')
+        Post.objects.create(author=user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_text_report(self):
+        """?profile_templates=text отдаёт отчёт вместо страницы"""
+        response = self.client.get(
+            reverse('posts:main_page'), {'profile_templates': 'text'})
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        report = response.content.decode()
+        self.assertIn('posts/index.html', report)
+        self.assertIn('posts/includes/post_card.html', report)
+        self.assertIn('{% cache %}', report)
+
+    def test_server_timing_header(self):
+        """Без text страница та же, а профиль — в Server-Timing"""
+        response = self.client.get(
+            reverse('posts:main_page'), {'profile_templates': ''})
+        self.assertContains(response, 'Тестовый пост')
+        self.assertRegex(response['Server-Timing'], r'^tpl0;desc=".+";dur=')
+
+    @override_settings(TEMPLATE_PROFILER_ALLOWED_IPS=[])
+    def test_foreign_ip_ignored(self):
+        """С чужого адреса параметр ничего не включает"""
+        response = self.client.get(
+            reverse('posts:main_page'), {'profile_templates': 'text'})
+        self.assertContains(response, 'Тестовый пост')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class ProductionSettingsTest(SimpleTestCase):
+    def test_cached_template_loader(self):
+        """Боевые настройки разбирают шаблоны один раз и без DEBUG"""
+        production = importlib.import_module('yatube.settings_production')
+        self.assertFalse(production.DEBUG)
+        self.assertNotIn('debug_toolbar', production.INSTALLED_APPS)
+        options = production.TEMPLATES[0]['OPTIONS']
+        loader, loaders = options['loaders'][0]
+        self.assertEqual(loader, 'django.template.loaders.cached.Loader')
+        self.assertFalse(production.TEMPLATES[0]['APP_DIRS'])
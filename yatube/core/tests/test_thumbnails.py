@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Post
+from .. import thumbnails
+from ..thumbnails import backend, cached_thumbnail
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+FEED = ('960x339', {'crop': 'center', 'upscale': True})
+
+
+def uploaded_gif():
+    return SimpleUploadedFile(
+        name='small.gif', content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPregenerationTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('Author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_post_create_pregenerates_feed_thumbnail(self):
+        """После публикации миниатюра для ленты уже лежит в kvstore"""
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост с картинкой', 'image': uploaded_gif()})
+        post = Post.objects.get(text='Пост с картинкой')
+
+        geometry, options = FEED
+        self.assertIsNotNone(backend.lookup(post.image, geometry, **options))
+
+    def test_ready_thumbnail_refreshes_cached_feed(self):
+        """Готовая миниатюра сбрасывает закешированную ленту
+        с исходной картинкой"""
+        post = Post.objects.create(author=self.user, image=uploaded_gif())
+        url = reverse('posts:main_page')
+        with mock.patch.object(thumbnails, 'queue_thumbnail'):
+            self.assertContains(self.client.get(url), post.image.url)
+
+        # Заказ с id поста: готовая миниатюра сбросит его карточку.
+        thumbnails.queue_thumbnails(post.image, post.pk)
+        geometry, options = FEED
+        thumbnail = backend.lookup(post.image, geometry, **options)
+        self.assertIsNotNone(thumbnail)
+        # Карточки сбрасываются по id из заказа, без поиска по image.
+        with self.assertNumQueries(0):
+            thumbnails.thumbnail_ready.send(
+                sender=None, name=post.image.name, post_ids=[post.pk])
+        response = self.client.get(url)
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, post.image.url)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailLookupTest(TestCase):
+    def test_missing_thumbnail_falls_back(self):
+        """Пока миниатюры нет, тег отдаёт None, а лента — исходную
+        картинку, не нарезая её во время рендера"""
+        user = User.objects.create_user('Author')
+        post = Post.objects.create(author=user, image=uploaded_gif())
+        geometry, options = FEED
+
+        self.assertIsNone(cached_thumbnail(post.image, geometry, **options))
+
+        cache.clear()
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, post.image.url)
@@ -0,0 +1,143 @@
+"""Фоновая подготовка миниатюр sorl-thumbnail.
+
+Тег {% thumbnail %} режет картинку прямо во время рендера, если миниатюры
+ещё нет, так что первый запрос к новому посту платит за декодирование,
+масштабирование и кодирование в Pillow, а популярный пост может
+запустить несколько одинаковых ресайзов сразу.
+
+Здесь миниатюры заказываются при сохранении поста и режутся в пуле
+потоков, а шаблоны лент только смотрят в key-value хранилище sorl
+(тег cached_thumbnail). Пока миниатюры нет, шаблон показывает исходную
+картинку, а генерация ставится в очередь. Заказ может нести id поста
+с этой картинкой; когда миниатюра готова, уходит сигнал thumbnail_ready
+с именем исходного файла и id всех постов, заказавших её, — по ним
+приложения сбрасывают закешированные страницы с исходником.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.dispatch import Signal
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+# Задачи в работе: ключ задачи -> id постов, ждущих миниатюру.
+_pending = {}
+
+thumbnail_ready = Signal(providing_args=['name', 'post_ids'])
+
+
+class LookupThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который умеет только искать готовую миниатюру."""
+
+    def thumbnail_name(self, file_, geometry_string, **options):
+        # Те же шаги, что в ThumbnailBackend.get_thumbnail(), чтобы имя
+        # совпадало с тем, под которым миниатюру сохранит генерация.
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+    def lookup(self, file_, geometry_string, **options):
+        name = self.thumbnail_name(file_, geometry_string, **options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = LookupThumbnailBackend()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _generate(name, geometry_string, options, job_key):
+    try:
+        if default.storage.exists(name):
+            default.backend.get_thumbnail(name, geometry_string, **options)
+            with _executor_lock:
+                post_ids = _pending.pop(job_key, set())
+            thumbnail_ready.send(
+                sender=None, name=name, post_ids=sorted(post_ids))
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюру %s', name)
+    finally:
+        with _executor_lock:
+            _pending.pop(job_key, None)
+        if settings.THUMBNAIL_WORKERS:
+            # Поток пула открыл своё соединение для kvstore — закрываем.
+            connections.close_all()
+
+
+def _submit(name, geometry_string, options, post_id):
+    job_key = (name, geometry_string, tuple(sorted(options.items())))
+    with _executor_lock:
+        queued = job_key in _pending
+        post_ids = _pending.setdefault(job_key, set())
+        if post_id is not None:
+            post_ids.add(post_id)
+        if queued:
+            return
+    if not settings.THUMBNAIL_WORKERS:
+        _generate(name, geometry_string, options, job_key)
+        return
+    _get_executor().submit(_generate, name, geometry_string, options, job_key)
+
+
+def queue_thumbnail(image, geometry_string, post_id=None, **options):
+    """Ставит генерацию миниатюры в очередь, если её ещё не режут.
+
+    Задача уходит в пул только после коммита транзакции: файл и пост
+    к этому моменту точно сохранены, а откатившийся пост ничего не режет.
+    post_id попадёт в сигнал thumbnail_ready.
+    """
+    name = image.name
+    transaction.on_commit(
+        lambda: _submit(name, geometry_string, options, post_id))
+
+
+def queue_thumbnails(image, post_id=None):
+    """Заказывает все миниатюры, которые нужны шаблонам лент."""
+    if not image:
+        return
+    for geometry_string, options in settings.THUMBNAIL_PREGENERATE:
+        queue_thumbnail(image, geometry_string, post_id, **options)
+
+
+def cached_thumbnail(image, geometry_string, post_id=None, **options):
+    """Готовая миниатюра из kvstore или None.
+
+    При промахе ставит генерацию в очередь, а шаблон показывает исходное
+    изображение; сам рендер картинку не режет.
+    """
+    if not image:
+        return None
+    thumbnail = backend.lookup(image, geometry_string, **options)
+    if thumbnail is None:
+        queue_thumbnail(image, geometry_string, post_id, **options)
+        if not settings.THUMBNAIL_WORKERS:
+            # Без пула миниатюра уже нарезана синхронно (если не
+            # помешала открытая транзакция) — посмотрим ещё раз.
+            thumbnail = backend.lookup(image, geometry_string, **options)
+    return thumbnail
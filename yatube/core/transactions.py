@@ -0,0 +1,53 @@
+"""Записи, которые переживают занятую базу.
+
+SQLite пускает одного писателя за раз. Транзакцию write_atomic()
+бэкенд core.backends.sqlite3 начинает с BEGIN IMMEDIATE — она ждёт
+блокировку busy timeout, но под пиковой нагрузкой и он может истечь.
+Тогда write_atomic() повторяет функцию целиком с нарастающей паузой —
+от повтора отдельного запроса толку нет, вся транзакция к этому
+моменту уже откатилась.
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, transaction
+from django.db import connections
+
+RETRIES = 3
+BACKOFF = 0.05
+
+
+def is_locked(exc):
+    message = str(exc).lower()
+    return 'locked' in message or 'busy' in message
+
+
+@contextmanager
+def write_intent(connection):
+    """Помечает соединение: следующая транзакция будет писать."""
+    previous = getattr(connection, 'write_intent', False)
+    connection.write_intent = True
+    try:
+        yield
+    finally:
+        connection.write_intent = previous
+
+
+def write_atomic(func, using=DEFAULT_DB_ALIAS, retries=RETRIES):
+    """Выполняет func() в transaction.atomic() с повторами при блокировке.
+
+    Внутри внешней транзакции повторять нечего: ошибка уходит наружу,
+    и её обработает тот, кто эту транзакцию открыл.
+    """
+    attempt = 0
+    while True:
+        try:
+            with write_intent(connections[using]), \
+                    transaction.atomic(using=using):
+                return func()
+        except OperationalError as exc:
+            if (attempt >= retries or not is_locked(exc)
+                    or connections[using].in_atomic_block):
+                raise
+        time.sleep(BACKOFF * 2 ** attempt)
+        attempt += 1
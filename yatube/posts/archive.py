@@ -0,0 +1,116 @@
+"""Горячее и холодное хранение постов.
+
+Почти все запросы приходят к свежим постам, а Post и его индексы
+растут без конца. archive_before() переносит посты старше порога
+вместе с комментариями в ArchivedPost и ArchivedComment пачками по
+CHUNK_SIZE: каждая пачка — INSERT … SELECT и DELETE в одной
+транзакции, без загрузки строк в Python и без сигналов Post.
+Счётчики UserStats учитывают архив (см. posts.counters), а сам пост
+уходит из материализованных лент подписок и из поискового индекса:
+поиск ищет только по горячим постам.
+
+Профиль, группа и страница поста — и на сайте, и в API — читают обе
+таблицы (find_post, MergedCursorPaginator). Свежайшая дата архива
+хранится в кеше, поэтому первые страницы лент архив не читают вовсе.
+"""
+from functools import partial
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+
+from core.transactions import write_atomic
+from .caching import bump_feed_generation
+from .models import (ArchivedComment, ArchivedPost, Comment, Post,
+                     TimelineEntry)
+from .search import FTS_TABLE
+
+CHUNK_SIZE = 500
+HORIZON_KEY = 'posts:archive_horizon'
+# В кеше нельзя отличить None от промаха, поэтому пустой архив
+# помечается отдельным значением.
+EMPTY = 'empty'
+
+POST_COLUMNS = (
+    'id, text, pub_date, updated, author_id, group_id, image,'
+    ' comments_count')
+COMMENT_COLUMNS = 'id, post_id, author_id, text, created'
+
+
+def horizon():
+    """Дата самого свежего архивного поста или None, если архив пуст."""
+    newest = cache.get(HORIZON_KEY)
+    if newest is None:
+        newest = ArchivedPost.objects.aggregate(
+            newest=Max('pub_date'))['newest'] or EMPTY
+        cache.set(HORIZON_KEY, newest, None)
+    return None if newest == EMPTY else newest
+
+
+def find_post(pk, related=(), prepare=None):
+    """Пост по id из горячей таблицы, а если его там нет — из архива.
+
+    prepare(queryset) дополнительно настраивает запрос к каждой из
+    таблиц, например ограничивает колонки.
+    """
+    for model in (Post, ArchivedPost):
+        queryset = model.objects.all()
+        if related:
+            # select_related() без аргументов подтянул бы все внешние ключи.
+            queryset = queryset.select_related(*related)
+        if prepare is not None:
+            queryset = prepare(queryset)
+        post = queryset.filter(pk=pk).first()
+        if post is not None:
+            return post
+    return None
+
+
+def _move(ids):
+    placeholders = ', '.join(['%s'] * len(ids))
+    posts = Post._meta.db_table
+    comments = Comment._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ArchivedPost._meta.db_table} ({POST_COLUMNS})'
+            f' SELECT {POST_COLUMNS} FROM {posts}'
+            f' WHERE id IN ({placeholders})', ids)
+        cursor.execute(
+            f'INSERT INTO {ArchivedComment._meta.db_table}'
+            f' ({COMMENT_COLUMNS})'
+            f' SELECT {COMMENT_COLUMNS} FROM {comments}'
+            f' WHERE post_id IN ({placeholders})', ids)
+        moved_comments = cursor.rowcount
+        for table, column in (
+            (comments, 'post_id'),
+            (TimelineEntry._meta.db_table, 'post_id'),
+            (FTS_TABLE, 'rowid'),
+            (posts, 'id'),
+        ):
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {column} IN ({placeholders})',
+                ids)
+    return moved_comments
+
+
+def archive_before(threshold, chunk_size=CHUNK_SIZE, progress=None):
+    """Переносит в архив посты, опубликованные раньше threshold.
+
+    Возвращает (число постов, число комментариев). Пачки идут от самых
+    старых постов, так что прерванный перенос можно просто повторить.
+    """
+    old = Post.objects.filter(pub_date__lt=threshold).order_by(
+        'pub_date', 'pk').values_list('pk', flat=True)
+    total_posts = total_comments = 0
+    while True:
+        ids = list(old[:chunk_size])
+        if not ids:
+            break
+        total_comments += write_atomic(partial(_move, ids))
+        total_posts += len(ids)
+        if progress is not None:
+            progress(total_posts, total_comments)
+    if total_posts:
+        cache.delete(HORIZON_KEY)
+        bump_feed_generation()
+    return total_posts, total_comments
@@ -0,0 +1,250 @@
+"""Нагрузочные сценарии для views posts (см. manage.py benchmark).
+
+Каждый сценарий — один view, который гоняется через тестовый клиент
+Django (полный стек middleware и шаблонов, без сети) из нескольких
+потоков. По каждому считаются пропускная способность и перцентили
+задержки; результаты можно сохранить как базовые и сравнивать с ними
+следующие прогоны.
+"""
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from .models import Post, UserStats
+
+SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment', 'mixed',
+)
+DEFAULT_TOLERANCE = 0.2
+# В смешанном сценарии каждый WRITE_EVERY-й запрос — запись.
+WRITE_EVERY = 5
+# Сколько поток ждёт остальных у старта замера. Прогрев обычно занимает
+# секунды; дольше — значит, какой-то поток завис, и ждать его нет смысла.
+BARRIER_TIMEOUT = 300
+# Настройки стандартного бэкенда django.db.backends.sqlite3 для
+# сравнения с core.backends.sqlite3 (manage.py benchmark --sqlite stock).
+# journal_mode задаётся явно: WAL сохраняется в файле базы.
+STOCK_SQLITE = {
+    'pragmas': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'mmap_size': 0,
+        'cache_size': -2000,
+        'temp_store': 'DEFAULT',
+    },
+    'transaction_mode': 'DEFERRED',
+}
+
+
+class Scenario:
+    def __init__(self, name, url, user=None, data=None):
+        self.name = name
+        self.url = url
+        self.user = user
+        self.data = data
+
+    def client(self):
+        client = Client()
+        if self.user is not None:
+            client.force_login(self.user)
+        return client
+
+    def send(self, client):
+        if self.data is None:
+            return client.get(self.url)
+        return client.post(self.url, self.data)
+
+
+class MixedScenario(Scenario):
+    """Чтения вперемешку с записями от одного пользователя: так
+    проверяется, мешают ли записи чтениям и друг другу."""
+
+    def __init__(self, name, reads, writes, user):
+        super().__init__(name, None, user)
+        self.reads = reads
+        self.writes = writes
+
+    def client(self):
+        client = super().client()
+        client.sent = 0
+        return client
+
+    def send(self, client):
+        client.sent += 1
+        if client.sent % WRITE_EVERY:
+            pool = self.reads
+        else:
+            pool = self.writes
+        return pool[client.sent % len(pool)].send(client)
+
+
+def build_scenarios(names=SCENARIOS):
+    """Сценарии на самых тяжёлых объектах засеянной базы: самая большая
+    группа, самый плодовитый автор, самый обсуждаемый пост и пользователь
+    с наибольшим числом подписок."""
+    group = Post.objects.filter(group__isnull=False).values(
+        'group__slug').annotate(total=Count('pk')).order_by('-total').first()
+    author = UserStats.objects.select_related('user').order_by(
+        '-posts_count').first()
+    reader = UserStats.objects.select_related('user').order_by(
+        '-following_count').first()
+    post = Post.objects.order_by('-comments_count').first()
+    if not (group and author and reader and post):
+        raise ValueError('В базе нет данных для сценариев, запустите seed.')
+    reader = reader.user
+    available = {
+        'index': Scenario('index', reverse('posts:main_page')),
+        'group_posts': Scenario('group_posts', reverse(
+            'posts:group_posts', args=[group['group__slug']])),
+        'profile': Scenario('profile', reverse(
+            'posts:profile', args=[author.user.username])),
+        'post_detail': Scenario('post_detail', reverse(
+            'posts:post_detail', args=[post.pk])),
+        'follow_index': Scenario(
+            'follow_index', reverse('posts:follow_index'), reader),
+        'post_create': Scenario(
+            'post_create', reverse('posts:post_create'), reader,
+            {'text': 'Пост из бенчмарка'}),
+        'add_comment': Scenario(
+            'add_comment', reverse('posts:add_comment', args=[post.pk]),
+            reader, {'text': 'Комментарий из бенчмарка'}),
+    }
+    available['mixed'] = MixedScenario(
+        'mixed',
+        [available[name] for name in ('index', 'post_detail', 'profile')],
+        [available[name] for name in ('add_comment', 'post_create')],
+        reader,
+    )
+    return [available[name] for name in names]
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу; values отсортированы."""
+    if not values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def _first_error(futures):
+    """Исходная ошибка потоков, а не BrokenBarrierError тех, кого
+    разбудил abort() упавшего потока; None — ошибок нет."""
+    errors = [
+        future.exception() for future in futures
+        if future.exception() is not None
+    ]
+    for error in errors:
+        if not isinstance(error, threading.BrokenBarrierError):
+            return error
+    return errors[0] if errors else None
+
+
+def _warm_up(scenario, warmup, barrier):
+    """Клиент сценария после прогрева; с barrier — когда прогреты все."""
+    try:
+        client = scenario.client()
+        for _ in range(warmup):
+            scenario.send(client)
+    except Exception:
+        # Остальные потоки ждут этот у барьера: abort() будит их
+        # BrokenBarrierError вместо вечного ожидания.
+        if barrier is not None:
+            barrier.abort()
+        raise
+    if barrier is not None:
+        barrier.wait(BARRIER_TIMEOUT)
+    return client
+
+
+def _in_threads(worker, counts):
+    """Результаты worker(count) из отдельного потока на каждый count."""
+    def threaded(count):
+        try:
+            return worker(count)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(counts)) as executor:
+        futures = [executor.submit(threaded, count) for count in counts]
+    error = _first_error(futures)
+    if error is not None:
+        raise error
+    return [result for future in futures for result in future.result()]
+
+
+def run(scenario, requests, concurrency=1, warmup=5):
+    """Выполняет сценарий и возвращает сводку задержек в секундах."""
+    counts = [
+        requests // concurrency + (1 if number < requests % concurrency
+                                   else 0)
+        for number in range(concurrency)
+    ]
+    barrier = threading.Barrier(concurrency) if concurrency > 1 else None
+
+    def worker(count):
+        client = _warm_up(scenario, warmup, barrier)
+        results = []
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                ok = scenario.send(client).status_code < 400
+            except Exception:
+                ok = False
+            results.append((time.perf_counter() - start, ok))
+        return results
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = worker(requests)
+    else:
+        results = _in_threads(worker, counts)
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, ok in results if not ok),
+        'rps': len(results) / elapsed if elapsed else 0.0,
+        'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+    }
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(path, results, meta):
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump(
+            {'meta': meta, 'scenarios': results}, baseline,
+            indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Регрессии относительно базовых результатов.
+
+    Возвращает [(сценарий, метрика, было, стало)]: p95 выросла или
+    пропускная способность упала больше чем на tolerance.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        if current['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append((name, 'p95', base['p95'], current['p95']))
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append((name, 'rps', base['rps'], current['rps']))
+    return regressions
@@ -0,0 +1,47 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+FEED_GENERATION_KEY = 'posts:feed_generation'
+FOLLOW_GENERATION_KEY = 'posts:follow_generation:{}'
+
+
+def _generation(key):
+    # Поколение — случайный токен, а не счётчик: после сброса кеша
+    # или пересоздания базы старые фрагменты не совпадут с новыми ключами.
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid4().hex
+        if not cache.add(key, generation, None):
+            generation = cache.get(key, generation)
+    return generation
+
+
+def _bump(key):
+    # Новое поколение — только после коммита: иначе параллельный
+    # читатель успел бы отрисовать старые строки под новым ключом,
+    # и устаревший фрагмент жил бы весь свой таймаут.
+    transaction.on_commit(lambda: cache.set(key, uuid4().hex, None))
+
+
+def feed_generation():
+    """Токен, меняющийся при любом изменении постов, групп и комментариев.
+
+    Входит в ключ закешированных фрагментов лент, так что фрагмент живёт,
+    пока данные под ним не изменились, а не фиксированные 20 секунд.
+    """
+    return _generation(FEED_GENERATION_KEY)
+
+
+def bump_feed_generation():
+    _bump(FEED_GENERATION_KEY)
+
+
+def follow_generation(user_id):
+    """Токен подписок пользователя для фрагмента его ленты подписок."""
+    return _generation(FOLLOW_GENERATION_KEY.format(user_id))
+
+
+def bump_follow_generation(user_id):
+    _bump(FOLLOW_GENERATION_KEY.format(user_id))
@@ -0,0 +1,65 @@
+"""ETag для лент и страницы поста.
+
+Функции подключаются к view через django.views.decorators.http.condition:
+если страница у клиента не устарела, он получает 304 без рендера.
+
+В ETag входит поколение лент (posts.caching), которое меняет любое
+изменение постов, групп и комментариев, а также адрес с параметрами,
+пользователь и его CSRF-секрет: страница содержит ник в шапке, кнопки
+подписки и токен формы.
+
+Last-Modified страницы не отдают: дата публикации не сдвигается ни при
+правке и удалении поста, ни при подписке, и клиент, присылающий только
+If-Modified-Since, получал бы 304 с устаревшей страницей.
+"""
+import hashlib
+
+from django.middleware.csrf import get_token
+
+from .caching import feed_generation, follow_generation
+from .models import Recommendation, UserStats
+from .recommendations import SHOWN
+
+
+def _etag(request, *parts):
+    csrf_secret = None
+    if request.user.is_authenticated:
+        # Формы на страницах есть только у вошедших. get_token() заводит
+        # секрет заранее, чтобы первый ответ и повторный запрос с уже
+        # выставленной cookie дали один и тот же ETag.
+        get_token(request)
+        csrf_secret = request.META['CSRF_COOKIE']
+    raw = '|'.join(map(str, (
+        request.get_full_path(),
+        request.user.pk,
+        csrf_secret,
+        feed_generation(),
+        *parts,
+    )))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def index_etag(request):
+    return _etag(request)
+
+
+def group_etag(request, slug):
+    return _etag(request)
+
+
+def profile_etag(request, username):
+    # Подписки и отписки не меняют поколение лент, но меняют кнопку
+    # «Подписаться» и счётчики подписчиков на странице.
+    counts = UserStats.objects.filter(user__username=username).values_list(
+        'followers_count', 'following_count').first()
+    following = recommended = None
+    if request.user.is_authenticated:
+        following = follow_generation(request.user.pk)
+        # Блок «Кого почитать» меняют и чужие подписки.
+        recommended = list(Recommendation.objects.filter(
+            user=request.user).values_list('author', 'score')[:SHOWN])
+    return _etag(request, following, counts, recommended)
+
+
+def post_etag(request, post_id):
+    return _etag(request)
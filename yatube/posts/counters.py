@@ -0,0 +1,82 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import ArchivedPost, Comment, Follow, Post, User, UserStats
+
+
+def _shift(field, delta):
+    # Счётчики не бывают отрицательными (CHECK >= 0): если он уже
+    # разошёлся с данными и стоит на нуле, уменьшение оставляет ноль,
+    # а не роняет запись IntegrityError. Точное значение вернёт
+    # reconcile_counters.
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def _count_subquery(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def change_user_counters(user_id, **deltas):
+    """Сдвигает счётчики пользователя: change_user_counters(1, posts_count=1).
+
+    Строки UserStats создаются лениво. Если её ещё нет, она заполняется
+    честным пересчётом, который уже учитывает текущее изменение. При
+    уменьшении строку не создаём: так бывает при каскадном удалении
+    пользователя, когда его UserStats уже удалён.
+    """
+    updated = UserStats.objects.filter(user_id=user_id).update(**{
+        field: _shift(field, delta) for field, delta in deltas.items()
+    })
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        reconcile_user(user_id)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shift('comments_count', delta))
+
+
+def get_user_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return reconcile_user(user.pk)
+
+
+def reconcile_user(user_id):
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': (
+                Post.objects.filter(author_id=user_id).count()
+                + ArchivedPost.objects.filter(author_id=user_id).count()),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id).count(),
+        },
+    )
+    return stats
+
+
+def reconcile_all():
+    """Пересчитывает все денормализованные счётчики одним UPDATE на поле."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True)
+    # Размер пачки выбирает бэкенд: SQLite не принимает больше
+    # 500 строк в одном INSERT.
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing.iterator()])
+    UserStats.objects.update(
+        posts_count=(
+            _count_subquery(Post.objects.all(), 'author')
+            + _count_subquery(ArchivedPost.objects.all(), 'author')),
+        followers_count=_count_subquery(Follow.objects.all(), 'author'),
+        following_count=_count_subquery(Follow.objects.all(), 'user'),
+    )
+    Post.objects.update(
+        comments_count=_count_subquery(Comment.objects.all(), 'post'))
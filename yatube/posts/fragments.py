@@ -0,0 +1,73 @@
+"""Кеш карточек постов для всех лент.
+
+Главная, группа, профиль, подписки и догрузка новых постов рисуют
+одну и ту же карточку (posts/includes/post_card.html). Каждая карточка
+кешируется отдельно под ключом из id поста и его поля updated, поэтому
+страница ленты — один get_many() по кешу и рендер только тех карточек,
+которых там нет. Правка поста меняет updated, и старая карточка просто
+перестаёт совпадать по ключу. Карточки помечены тегами автора и группы:
+переименование группы или автора сбрасывает их (см. posts.signals).
+
+Пока у картинки нет миниатюры, карточка показывает исходник. Готовая
+миниатюра сбрасывает такую карточку и фрагменты лент (сигнал
+thumbnail_ready, см. posts.signals), а короткий таймаут — на случай,
+если сигнал потерялся вместе с процессом, который резал картинку.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+
+from core.cache import author_tag, group_tag, post_tag
+from core.thumbnails import cached_thumbnail
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_KEY = 'posts:card:{version}:{pk}:{updated}'
+# Меняется вместе с разметкой карточки, чтобы после выкладки не жили
+# карточки старого вида.
+CARD_VERSION = 1
+CARD_TIMEOUT = 7 * 24 * 60 * 60
+PENDING_TIMEOUT = 60
+
+
+def card_key(post):
+    return CARD_KEY.format(
+        version=CARD_VERSION, pk=post.pk,
+        updated=post.updated.timestamp())
+
+
+def render_card(post):
+    """HTML карточки и время, на которое её можно закешировать."""
+    geometry_string, options = settings.THUMBNAIL_PREGENERATE[0]
+    thumbnail = cached_thumbnail(
+        post.image, geometry_string, post.pk, **options)
+    html = get_template(CARD_TEMPLATE).render(
+        {'post': post, 'thumbnail': thumbnail})
+    if post.image and thumbnail is None:
+        return html, PENDING_TIMEOUT
+    return html, CARD_TIMEOUT
+
+
+def card_tags(post):
+    tags = [post_tag(post.pk), author_tag(post.author_id)]
+    if post.group_id:
+        tags.append(group_tag(post.group_id))
+    return tags
+
+
+def render_cards(posts):
+    """Карточки постов в исходном порядке: из кеша или свежий рендер."""
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    # Недостающие карточки пишутся одним set_many() на таймаут, а не
+    # отдельной транзакцией на каждую.
+    missing = {}
+    tags = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            cards[key], timeout = render_card(post)
+            missing.setdefault(timeout, {})[key] = cards[key]
+            tags[key] = card_tags(post)
+    for timeout, entries in missing.items():
+        cache.set_many(entries, timeout, tags=tags)
+    return [cards[key] for key in keys]
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты старше заданного возраста вместе с комментариями '
+        'в архивные таблицы. Архивные посты открываются по прежним '
+        'адресам и видны в лентах автора и группы, но из поиска пропадают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=365,
+            help='Возраст поста в днях, после которого он уходит в архив.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=archive.CHUNK_SIZE,
+            help='Сколько постов переносить в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError('Возраст не может быть отрицательным.')
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер пачки должен быть больше 0.')
+        threshold = timezone.now() - timedelta(days=options['older_than'])
+
+        def progress(posts, comments):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {posts} постов, {comments} комментариев')
+
+        posts, comments = archive.archive_before(
+            threshold, options['chunk_size'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'В архив перенесено: {posts} постов, {comments} комментариев.'))
@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts import benchmark, seeding
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Засевает отдельную базу данными заданного размера и замеряет '
+        'пропускную способность и задержки views posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--preset',
+            choices=sorted(seeding.PRESETS),
+            default='small',
+            help='Размер данных (посты: small 10k, medium 100k, large 1M).',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--database',
+            help='Файл SQLite для базы бенчмарка (по умолчанию временный).',
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Не удалять базу после прогона и не засевать её повторно.',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=benchmark.SCENARIOS,
+            help='Сценарий (можно несколько раз); по умолчанию все.',
+        )
+        parser.add_argument(
+            '--sqlite',
+            choices=('production', 'stock'),
+            default='production',
+            help=(
+                'Настройки SQLite: production — как в settings '
+                '(core.backends.sqlite3), stock — как у стандартного '
+                'бэкенда Django, для сравнения.'
+            ),
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--baseline',
+            help='JSON с базовыми результатами для сравнения.',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Записать результаты прогона в --baseline.',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=benchmark.DEFAULT_TOLERANCE,
+            help='Допустимое ухудшение p95 и rps относительно базовых.',
+        )
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline требует --baseline.')
+        directory = tempfile.mkdtemp(prefix='yatube-benchmark-')
+        database = options['database'] or os.path.join(
+            directory, 'db.sqlite3')
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        test_settings['NAME'] = database
+        if options['sqlite'] == 'stock':
+            connection.settings_dict['OPTIONS'] = {
+                **connection.settings_dict['OPTIONS'],
+                **benchmark.STOCK_SQLITE,
+            }
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+            keepdb=options['keepdb'],
+        )
+        try:
+            # Продакшен-режим: без debug_toolbar и журнала SQL-запросов,
+            # кеш — в отдельном файле, чтобы не трогать кеш разработки.
+            with override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                CACHES={'default': {
+                    'BACKEND': 'core.cache.SQLiteCache',
+                    'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+                }},
+            ):
+                self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+            if options['database'] or not options['keepdb']:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def benchmark(self, options):
+        if not Post.objects.exists():
+            sizes = seeding.PRESETS[options['preset']]
+            self.stdout.write(f'Засеваем базу: {sizes}')
+            seeding.seed(seed=options['seed'], **sizes)
+        scenarios = benchmark.build_scenarios(
+            options['scenario'] or benchmark.SCENARIOS)
+
+        results = {}
+        self.stdout.write(
+            f'{"сценарий":<14}{"rps":>9}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"p99, мс":>10}{"ошибки":>8}')
+        for scenario in scenarios:
+            result = benchmark.run(
+                scenario, options['requests'], options['concurrency'])
+            results[scenario.name] = result
+            self.stdout.write(
+                f'{scenario.name:<14}{result["rps"]:>9.1f}'
+                f'{result["p50"] * 1000:>10.1f}'
+                f'{result["p95"] * 1000:>10.1f}'
+                f'{result["p99"] * 1000:>10.1f}{result["errors"]:>8}')
+
+        baseline = options['baseline']
+        if options['save_baseline']:
+            benchmark.save_baseline(baseline, results, {
+                'preset': options['preset'],
+                'seed': options['seed'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'sqlite': options['sqlite'],
+            })
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовые результаты записаны в {baseline}.'))
+        elif baseline:
+            regressions = benchmark.compare(
+                results, benchmark.load_baseline(baseline),
+                options['tolerance'])
+            for name, metric, before, after in regressions:
+                self.stderr.write(
+                    f'{name}: {metric} {before:.4f} -> {after:.4f}')
+            if regressions:
+                raise CommandError('Производительность ухудшилась.')
+            self.stdout.write(self.style.SUCCESS(
+                'Регрессий относительно базовых результатов нет.'))
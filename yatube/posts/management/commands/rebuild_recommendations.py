@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает рекомендации «кого почитать» (Recommendation).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=recommendations.CHUNK_SIZE,
+            help='Сколько пользователей пересчитывать в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        count = recommendations.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендации пересобраны: {count} записей.'))
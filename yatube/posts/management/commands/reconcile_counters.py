@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, комментариев '
+        'и подписок.'
+    )
+
+    def handle(self, *args, **options):
+        counters.reconcile_all()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
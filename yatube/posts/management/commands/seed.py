@@ -0,0 +1,105 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import seeding
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро генерирует пользователей, группы, посты, комментарии '
+        'и подписки со скошенными распределениями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--preset',
+            choices=sorted(seeding.PRESETS),
+            default='small',
+            help='Базовые объёмы (посты: small 10k, medium 100k, large 1M).',
+        )
+        for name in ('users', 'groups', 'posts', 'comments'):
+            parser.add_argument(
+                f'--{name}', type=int, help='Переопределяет объём пресета.')
+        parser.add_argument(
+            '--follows',
+            type=int,
+            help='Среднее число подписок на пользователя.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Один и тот же seed даёт одни и те же данные.',
+        )
+        parser.add_argument(
+            '--now',
+            help=(
+                'Момент, от которого отсчитываются даты, в ISO 8601; '
+                f'по умолчанию {seeding.EPOCH:%Y-%m-%d}.'),
+        )
+        parser.add_argument(
+            '--images',
+            type=float,
+            default=0.0,
+            help='Доля постов с картинкой, от 0 до 1.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Процессов для генерации строк (0 — без пула).',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=seeding.CHUNK_SIZE,
+            help='Строк в одной пачке генерации.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images должно быть от 0 до 1.')
+        if options['workers'] < 0:
+            raise CommandError('Число воркеров не может быть отрицательным.')
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер пачки должен быть больше 0.')
+        now = seeding.EPOCH
+        if options['now']:
+            now = parse_datetime(options['now'])
+            if now is None:
+                raise CommandError('--now должно быть датой ISO 8601.')
+            if timezone.is_naive(now):
+                now = timezone.make_aware(now)
+        prefix = f'seed{options["seed"]}_'
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Данные с seed {options["seed"]} уже есть, '
+                'укажите другой --seed.')
+        sizes = dict(seeding.PRESETS[options['preset']])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+        started = time.monotonic()
+        counts = seeding.seed(
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            images=options['images'],
+            workers=options['workers'],
+            progress=self.progress,
+            now=now,
+            **sizes,
+        )
+        elapsed = time.monotonic() - started
+        summary = ', '.join(
+            f'{name}: {count}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с — {summary}.'))
+
+    def progress(self, model_name, count):
+        if self.verbosity > 1:
+            self.stdout.write(f'{model_name}: {count}')
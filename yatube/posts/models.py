@@ -20,6 +20,7 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
@@ -27,15 +28,38 @@ class Post(models.Model):
         null=True,
         on_delete=models.SET_NULL,
         related_name='posts_group',
+        db_index=False,
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True,
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # Версия карточки поста в кеше фрагментов (см. posts.fragments):
+    # меняется при каждом сохранении, в том числе при правке.
+    updated = models.DateTimeField(auto_now=True)
+
+    is_archived = False
 
     class Meta:
         ordering = ['-pub_date']
+        # Индексы повторяют реальные пути доступа лент: фильтр по автору
+        # или группе и сортировка по дате берутся из одного индекса.
+        # Отдельные индексы внешних ключей author и group им не нужны.
+        # Поля по возрастанию намеренно: SQLite читает индекс с конца,
+        # и неявный rowid в хвосте индекса закрывает сортировку по id.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -47,6 +71,7 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         blank=True,
         null=True,
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -57,6 +82,12 @@ class Comment(models.Model):
 
     class Meta:
         default_related_name = 'comments'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -69,6 +100,7 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='following',
+        db_index=False,
     )
 
     class Meta:
@@ -77,3 +109,183 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_author_user_following'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые иначе пришлось бы считать COUNT(*).
+
+    Поддерживаются в той же транзакции, что и изменение постов и подписок
+    (см. posts.counters); расхождения исправляет reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост автора у каждого подписчика.
+
+    Заполняется при публикации поста и при подписке, поэтому follow_index
+    читает ленту одним диапазоном индекса (user, pub_date, post)
+    без JOIN на Follow и без сортировки.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_feed_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+
+
+class Recommendation(models.Model):
+    """Кого почитать: top-K авторов для пользователя с весом.
+
+    Собирается пачками командой rebuild_recommendations и поправляется
+    при каждой подписке и отписке (см. posts.recommendations), поэтому
+    страница читает готовый список одним диапазоном индекса.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['-score', 'author']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_recommendation_user_author',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score', 'author'],
+                name='recommendation_user_score_idx',
+            ),
+        ]
+
+
+class ArchivedPost(models.Model):
+    """Старый пост, перенесённый из Post командой archive_posts.
+
+    id и поля те же, что у Post, так что ссылки на пост не меняются,
+    а шаблоны показывают его так же. Архив только для чтения: правка
+    и новые комментарии к нему не принимаются. Таблицы и индексы Post
+    при этом остаются маленькими (см. posts.archive).
+    """
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField()
+    pub_date = models.DateTimeField()
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        db_index=False,
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        db_index=False,
+    )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        blank=True,
+    )
+    comments_count = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField()
+
+    is_archived = True
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['pub_date'], name='archived_post_pub_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='archived_post_author_idx',
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='archived_post_group_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.text[:15]
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+    )
+    text = models.TextField()
+    created = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='archived_comment_post_idx',
+            ),
+        ]
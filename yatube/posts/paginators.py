@@ -0,0 +1,240 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def pack_cursor(*parts):
+    """Упаковывает части позиции в непрозрачную строку для URL."""
+    raw = '|'.join(str(part) for part in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(cursor):
+    """Обратное к pack_cursor(); для испорченной строки возвращает None."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return raw.split('|')
+
+
+def encode_cursor(direction, pub_date=None, pk=None):
+    """Упаковывает позицию в ленте в непрозрачную строку для URL."""
+    if pub_date is None:
+        return pack_cursor(direction)
+    return pack_cursor(direction, pub_date.isoformat(), pk)
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор в (direction, pub_date, pk).
+
+    Для испорченного курсора возвращает None — тогда отдаём первую страницу,
+    как это делает Paginator.get_page() для неверного номера.
+    """
+    parts = unpack_cursor(cursor)
+    if parts is None or parts[0] not in (FORWARD, BACKWARD):
+        return None
+    if len(parts) == 1:
+        return parts[0], None, None
+    if len(parts) != 3:
+        return None
+    pub_date = parse_datetime(parts[1])
+    if pub_date is None or not parts[2].isdigit():
+        return None
+    return parts[0], pub_date, int(parts[2])
+
+
+class CursorPage(Page):
+    """Страница курсорной ленты.
+
+    Соседние страницы известны по курсорам, а номер страницы и позиция
+    объектов в ленте — нет: их пришлось бы считать COUNT(*), от которого
+    курсорная пагинация и избавляет. Поэтому все методы Page, зависящие
+    от числа объектов, переопределены и базу не трогают; номер и индексы
+    равны None.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return (
+            f'<CursorPage {len(self)} objects, '
+            f'next={self.next_cursor!r}, previous={self.previous_cursor!r}>')
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return None
+
+    def previous_page_number(self):
+        return None
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id) от новых постов к старым.
+
+    Вместо COUNT(*) и LIMIT/OFFSET каждая страница — это один запрос
+    вида WHERE (pub_date, id) < (...) ORDER BY pub_date DESC, id DESC
+    LIMIT per_page + 1, поэтому глубокие страницы не дорожают.
+    Лишняя строка нужна, только чтобы узнать, есть ли следующая страница.
+
+    date_field и pk_field задают ключ, если лента строится не по Post,
+    а, например, по записям материализованной ленты подписок;
+    oldest_first разворачивает порядок (так листаются комментарии).
+    """
+
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page=POSTS_PER_PAGE,
+                 date_field='pub_date', pk_field='pk', oldest_first=False):
+        sign = '' if oldest_first else '-'
+        # Порядок ключа задан сразу: Paginator иначе предупреждает
+        # о неупорядоченном queryset, хотя срезы упорядочивает _slice().
+        super().__init__(
+            object_list.order_by(f'{sign}{date_field}', f'{sign}{pk_field}'),
+            per_page,
+        )
+        self.date_field = date_field
+        self.pk_field = pk_field
+        self.oldest_first = oldest_first
+        self.last_cursor = encode_cursor(BACKWARD)
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            direction, pub_date, pk = FORWARD, None, None
+        else:
+            direction, pub_date, pk = decoded
+
+        date_field, pk_field = self.date_field, self.pk_field
+        ascending = (direction == FORWARD) == self.oldest_first
+        condition = None
+        if pub_date is not None:
+            lookup = 'gt' if ascending else 'lt'
+            condition = (
+                Q(**{f'{date_field}__{lookup}': pub_date})
+                | Q(**{date_field: pub_date, f'{pk_field}__{lookup}': pk})
+            )
+
+        items = self._fetch(ascending, condition, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == FORWARD:
+            has_next = has_more
+            has_previous = pub_date is not None
+        else:
+            if not has_more:
+                # Дошли до начала ленты — это просто первая страница.
+                return self.get_page(None)
+            items.reverse()
+            has_previous = True
+            has_next = pub_date is not None
+
+        next_cursor = previous_cursor = None
+        if items:
+            first, last = items[0], items[-1]
+            if has_next:
+                next_cursor = encode_cursor(
+                    FORWARD,
+                    getattr(last, date_field), getattr(last, pk_field))
+            if has_previous:
+                previous_cursor = encode_cursor(
+                    BACKWARD,
+                    getattr(first, date_field), getattr(first, pk_field))
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+    def _fetch(self, ascending, condition, limit):
+        return self._slice(self.object_list, ascending, condition, limit)
+
+    def _slice(self, queryset, ascending, condition, limit):
+        sign = '' if ascending else '-'
+        queryset = queryset.order_by(
+            f'{sign}{self.date_field}', f'{sign}{self.pk_field}')
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        return list(queryset[:limit])
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Keyset-пагинация по нескольким таблицам как по одной ленте.
+
+    Каждая страница — срез из каждого queryset с тем же условием
+    и LIMIT, слитый по (pub_date, id). newest — самая свежая дата
+    в каждом queryset, если она известна заранее: такой queryset не
+    читается, пока страница целиком помещается в более новые записи.
+    Так лента «горячие посты + архив» не трогает архив на первых
+    страницах.
+    """
+
+    def __init__(self, querysets, per_page=POSTS_PER_PAGE,
+                 date_field='pub_date', pk_field='pk', oldest_first=False,
+                 newest=None):
+        super().__init__(
+            querysets[0], per_page, date_field, pk_field, oldest_first)
+        self.querysets = querysets
+        self.newest = newest or [None] * len(querysets)
+
+    def _key(self, item):
+        return getattr(item, self.date_field), getattr(item, self.pk_field)
+
+    def _fetch(self, ascending, condition, limit):
+        items = []
+        for queryset, newest in zip(self.querysets, self.newest):
+            if (not ascending and len(items) >= limit and newest is not None
+                    and getattr(items[limit - 1], self.date_field) > newest):
+                continue
+            items.extend(self._slice(queryset, ascending, condition, limit))
+            items.sort(key=self._key, reverse=not ascending)
+        return items[:limit]
+
+
+def paginate(request, queryset, per_page=POSTS_PER_PAGE,
+             date_field='pub_date', pk_field='pk', archive=None,
+             archive_newest=None):
+    """Возвращает страницу ленты для запроса.
+
+    Старые ссылки вида ?page=N обслуживаются обычным Paginator,
+    всё остальное — курсорной пагинацией по ?cursor=. archive —
+    queryset архивных постов той же ленты: курсор листает их следом
+    за горячими, а ?page=N — только горячие. archive_newest — дата
+    самого свежего архивного поста, None — архив пуст.
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        paginator = Paginator(
+            queryset.order_by(f'-{date_field}', f'-{pk_field}'), per_page)
+        return paginator.get_page(page_number)
+    if archive is not None and archive_newest is not None:
+        paginator = MergedCursorPaginator(
+            [queryset, archive], per_page, date_field, pk_field,
+            newest=[None, archive_newest])
+    else:
+        paginator = CursorPaginator(queryset, per_page, date_field, pk_field)
+    return paginator.get_page(request.GET.get('cursor'))
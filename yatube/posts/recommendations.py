@@ -0,0 +1,240 @@
+"""Рекомендации «кого почитать» по графу подписок.
+
+Кандидаты двух видов:
+- друзья друзей: авторы, которых читают ваши подписки, — каждый такой
+  путь добавляет FOF_WEIGHT;
+- популярные авторы групп, в которых вы публикуетесь: лидер группы
+  по числу подписчиков добавляет GROUP_WEIGHT, следующие — меньше.
+Себя и тех, кого уже читаете, не рекомендуем. На пользователя хранится
+TOP_K лучших кандидатов (модель Recommendation).
+
+rebuild() пересобирает таблицу пачками по CHUNK_SIZE пользователей:
+друзья друзей каждой пачки считаются одним GROUP BY в базе.
+follow_changed() вызывается сигналами подписки и отписки и сдвигает
+веса только затронутых пар. Сдвиг приблизителен: отрезанных за top-K
+кандидатов он не видит, а автора, от которого отписались, вернёт в
+список лишь следующий rebuild().
+"""
+import heapq
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Follow, Group, Post, Recommendation, User
+
+TOP_K = 20
+SHOWN = 5
+CHUNK_SIZE = 1000
+GROUP_LEADERS = 20
+FOF_WEIGHT = 1.0
+GROUP_WEIGHT = 0.5
+# Веса — суммы дробей, поэтому «ноль» после вычитания сравниваем с порогом.
+MIN_SCORE = 0.01
+GROUP_LEADERS_KEY = 'posts:group_leaders:{}'
+
+
+def recommended(user, limit=SHOWN):
+    """Готовый список для страницы: один диапазон индекса (user, -score)."""
+    return Recommendation.objects.filter(user=user).select_related(
+        'author')[:limit]
+
+
+def _compute_group_leaders(posts):
+    """{group_id: [author_id, …]} — авторы групп по убыванию подписчиков."""
+    rows = posts.filter(group__isnull=False).order_by().values_list(
+        'group_id', 'author_id', 'author__stats__followers_count',
+    ).distinct()
+    authors = defaultdict(list)
+    for group_id, author_id, followers in rows.iterator():
+        authors[group_id].append((-(followers or 0), author_id))
+    return {
+        group_id: [
+            author_id for _, author_id in heapq.nsmallest(GROUP_LEADERS, pairs)
+        ]
+        for group_id, pairs in authors.items()
+    }
+
+
+def _group_leaders(group_ids):
+    """Лидеры групп из кеша; недостающие группы считаются и кешируются."""
+    keys = {GROUP_LEADERS_KEY.format(group_id): group_id
+            for group_id in group_ids}
+    leaders = {
+        keys[key]: value for key, value in cache.get_many(keys).items()
+    }
+    missing = [group_id for group_id in group_ids if group_id not in leaders]
+    if missing:
+        computed = _compute_group_leaders(
+            Post.objects.filter(group_id__in=missing))
+        computed = {
+            group_id: computed.get(group_id, []) for group_id in missing
+        }
+        cache.set_many({
+            GROUP_LEADERS_KEY.format(group_id): value
+            for group_id, value in computed.items()
+        }, None)
+        leaders.update(computed)
+    return leaders
+
+
+def _friends_of_friends(low, high):
+    """(user_id, author_id, число путей) для пользователей low..high."""
+    follow = Follow._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT f1.user_id, f2.author_id, COUNT(*)'
+            f' FROM {follow} f1'
+            f' JOIN {follow} f2 ON f2.user_id = f1.author_id'
+            ' WHERE f1.user_id BETWEEN %s AND %s'
+            ' GROUP BY f1.user_id, f2.author_id',
+            [low, high],
+        )
+        return cursor.fetchall()
+
+
+def _top(low, high, leaders=None):
+    """{user_id: [(author_id, score), …]} для пользователей low..high."""
+    scores = defaultdict(lambda: defaultdict(float))
+    for user_id, author_id, paths in _friends_of_friends(low, high):
+        scores[user_id][author_id] += FOF_WEIGHT * paths
+
+    groups = defaultdict(set)
+    posted = Post.objects.filter(
+        author_id__gte=low, author_id__lte=high, group__isnull=False,
+    ).order_by().values_list('author_id', 'group_id').distinct()
+    for user_id, group_id in posted.iterator():
+        groups[user_id].add(group_id)
+    if leaders is None and groups:
+        leaders = _group_leaders(set().union(*groups.values()))
+    for user_id, group_ids in groups.items():
+        for group_id in group_ids:
+            for rank, author_id in enumerate(leaders.get(group_id, ())):
+                scores[user_id][author_id] += (
+                    GROUP_WEIGHT * (1 - rank / GROUP_LEADERS))
+
+    followed = defaultdict(set)
+    follows = Follow.objects.filter(
+        user_id__gte=low, user_id__lte=high,
+    ).values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        followed[user_id].add(author_id)
+
+    top = {}
+    for user_id, candidates in scores.items():
+        skip = followed[user_id] | {user_id}
+        top[user_id] = heapq.nlargest(
+            TOP_K,
+            (item for item in candidates.items() if item[0] not in skip),
+            key=lambda item: (item[1], -item[0]),
+        )
+    return top
+
+
+def refresh_range(low, high, leaders=None):
+    """Пересчитывает рекомендации пользователей с id от low до high."""
+    top = _top(low, high, leaders)
+    Recommendation.objects.filter(
+        user_id__gte=low, user_id__lte=high).delete()
+    Recommendation.objects.bulk_create(
+        Recommendation(user_id=user_id, author_id=author_id, score=score)
+        for user_id, items in top.items()
+        for author_id, score in items
+    )
+    return sum(len(items) for items in top.values())
+
+
+def rebuild(chunk_size=CHUNK_SIZE):
+    """Пересобирает рекомендации всех пользователей.
+
+    Каждая пачка — своя транзакция: таблица не блокируется на всё время
+    пересборки, а страница видит либо старый, либо новый список.
+    """
+    leaders = _compute_group_leaders(Post.objects.all())
+    leaders = {
+        group_id: leaders.get(group_id, [])
+        for group_id in Group.objects.values_list('pk', flat=True)
+    }
+    cache.set_many({
+        GROUP_LEADERS_KEY.format(group_id): value
+        for group_id, value in leaders.items()
+    }, None)
+    user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+    total = 0
+    last_id = 0
+    while True:
+        bounds = list(user_ids.filter(pk__gt=last_id)[:chunk_size])
+        if not bounds:
+            break
+        with transaction.atomic():
+            total += refresh_range(bounds[0], bounds[-1], leaders)
+        last_id = bounds[-1]
+    return total
+
+
+def _add_candidates(candidates, params, limit=None):
+    """Добавляет пары (user_id, author_id) из запроса candidates с весом
+    FOF_WEIGHT, если их ещё нет, на автора не подписаны и у пользователя
+    меньше TOP_K рекомендаций."""
+    recommendation = Recommendation._meta.db_table
+    follow = Follow._meta.db_table
+    sql = (
+        f'INSERT INTO {recommendation} (user_id, author_id, score)'
+        f' SELECT c.user_id, c.author_id, %s FROM ({candidates}) c'
+        ' WHERE c.user_id != c.author_id'
+        f' AND NOT EXISTS (SELECT 1 FROM {follow} f'
+        '  WHERE f.user_id = c.user_id AND f.author_id = c.author_id)'
+        f' AND NOT EXISTS (SELECT 1 FROM {recommendation} r'
+        '  WHERE r.user_id = c.user_id AND r.author_id = c.author_id)'
+        f' AND (SELECT COUNT(*) FROM {recommendation} r'
+        '  WHERE r.user_id = c.user_id) < %s'
+    )
+    params = [FOF_WEIGHT, *params, TOP_K]
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def follow_changed(user_id, author_id, delta):
+    """Сдвигает веса после подписки (delta=1) или отписки (delta=-1).
+
+    Меняются две группы пар: авторы, которых читает author, — у user;
+    сам author — у подписчиков user.
+    """
+    shift = F('score') + FOF_WEIGHT * delta
+    own = Recommendation.objects.filter(
+        user_id=user_id,
+        author_id__in=Follow.objects.filter(
+            user_id=author_id).values('author_id'),
+    )
+    followers = Recommendation.objects.filter(
+        author_id=author_id,
+        user_id__in=Follow.objects.filter(
+            author_id=user_id).values('user_id'),
+    )
+    own.update(score=shift)
+    followers.update(score=shift)
+    if delta < 0:
+        own.filter(score__lt=MIN_SCORE).delete()
+        followers.filter(score__lt=MIN_SCORE).delete()
+        return
+
+    Recommendation.objects.filter(
+        user_id=user_id, author_id=author_id).delete()
+    follow = Follow._meta.db_table
+    free = TOP_K - Recommendation.objects.filter(user_id=user_id).count()
+    if free > 0:
+        _add_candidates(
+            f'SELECT %s AS user_id, author_id FROM {follow}'
+            ' WHERE user_id = %s',
+            [user_id, author_id],
+            limit=free,
+        )
+    _add_candidates(
+        f'SELECT user_id, %s AS author_id FROM {follow}'
+        ' WHERE author_id = %s',
+        [author_id, user_id],
+    )
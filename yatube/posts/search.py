@@ -0,0 +1,139 @@
+"""Полнотекстовый поиск по Post.text на SQLite FTS5.
+
+Индекс — виртуальная таблица posts_post_fts, где rowid совпадает с id
+поста (создаётся миграцией 0011_post_fts). Он обновляется по одному посту
+из сигналов post_save/post_delete, а rebuild_search_index пересобирает
+его пачками. Результаты ранжируются по bm25 и листаются курсором
+(rank, id), без OFFSET.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .paginators import pack_cursor, unpack_cursor
+
+FTS_TABLE = 'posts_post_fts'
+SEARCH_PER_PAGE = 10
+REBUILD_BATCH_SIZE = 5000
+
+WORD = re.compile(r'\w+')
+
+
+def build_match(query):
+    """Превращает пользовательский ввод в безопасное FTS5-выражение.
+
+    Каждое слово берётся в кавычки, поэтому операторы и скобки FTS5
+    из ввода не интерпретируются; последнее слово ищется как префикс.
+    """
+    words = WORD.findall(query or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def matching_ids(query):
+    """Подзапрос с id подходящих постов — для фильтра pk__in."""
+    match = build_match(query)
+    if match is None:
+        return None
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+
+
+def search(query, group_id=None, author_id=None, cursor=None,
+           limit=SEARCH_PER_PAGE):
+    """Ищет посты и возвращает ([(post_id, rank), ...], next_cursor).
+
+    rank — значение bm25: чем меньше, тем релевантнее.
+    """
+    match = build_match(query)
+    if match is None:
+        return [], None
+
+    where = [f'{FTS_TABLE} MATCH %s']
+    params = [match]
+    if group_id is not None:
+        where.append('p.group_id = %s')
+        params.append(group_id)
+    if author_id is not None:
+        where.append('p.author_id = %s')
+        params.append(author_id)
+    after = _decode(cursor)
+    if after is not None:
+        where.append(
+            f'(bm25({FTS_TABLE}) > %s'
+            f' OR (bm25({FTS_TABLE}) = %s AND p.id > %s))'
+        )
+        params.extend([after[0], after[0], after[1]])
+    params.append(limit + 1)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(
+            f'SELECT p.id, bm25({FTS_TABLE}) FROM {FTS_TABLE}'
+            f' JOIN posts_post p ON p.id = {FTS_TABLE}.rowid'
+            f' WHERE {" AND ".join(where)}'
+            f' ORDER BY bm25({FTS_TABLE}), p.id LIMIT %s',
+            params,
+        )
+        rows = db_cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_id, last_rank = rows[-1]
+        next_cursor = pack_cursor(repr(last_rank), last_id)
+    return rows, next_cursor
+
+
+def _decode(cursor):
+    parts = unpack_cursor(cursor) if cursor else None
+    if parts is None or len(parts) != 2 or not parts[1].isdigit():
+        return None
+    try:
+        return float(parts[0]), int(parts[1])
+    except ValueError:
+        return None
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Пересобирает индекс пачками по id, каждая пачка — одна транзакция."""
+    last_id = 0
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        while True:
+            cursor.execute(
+                'SELECT max(id), count(*) FROM ('
+                ' SELECT id FROM posts_post WHERE id > %s'
+                ' ORDER BY id LIMIT %s)',
+                [last_id, batch_size],
+            )
+            batch_last_id, count = cursor.fetchone()
+            if not count:
+                break
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text)'
+                ' SELECT id, text FROM posts_post'
+                ' WHERE id > %s AND id <= %s',
+                [last_id, batch_last_id],
+            )
+            last_id = batch_last_id
+            total += count
+    return total
@@ -0,0 +1,382 @@
+"""Генерация больших наборов данных для бенчмарков и локальной отладки.
+
+Строки генерируются пачками по chunk_size; у каждой пачки свой генератор
+случайных чисел, зависящий только от seed, вида данных и номера пачки,
+поэтому результат одинаков при любом числе воркеров. Пачки постов,
+комментариев и подписок можно генерировать в дочерних процессах (fork,
+а где его нет — spawn), а вставляет их один процесс через bulk_create
+в одной транзакции. На время
+вставки индексы из Meta.indexes снимаются и строятся заново в конце.
+
+Даты отсчитываются от фиксированного момента EPOCH (или переданного
+now), а не от текущего времени, так что один seed даёт одни и те же
+данные при любом запуске.
+
+bulk_create не вызывает сигналы posts, поэтому ленты подписок, счётчики
+и поисковый индекс пересобираются в конце одним проходом (finalize).
+
+Распределения скошенные, по закону Ципфа: немногие авторы пишут большую
+часть постов, немногие (другие) собирают большую часть подписчиков,
+немногие посты — большую часть комментариев.
+"""
+import io
+import multiprocessing
+import pickle
+import random
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import partial
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import counters, recommendations, search, seeding_worker, timeline
+from .models import Comment, Follow, Group, Post, User
+
+CHUNK_SIZE = 5000
+ZIPF_ALPHA = 1.1
+DAYS = 365
+NO_GROUP_SHARE = 0.3
+SEED_IMAGES = 16
+SEED_IMAGE_SIZE = (960, 540)
+# «Сейчас» сгенерированных данных: самый свежий пост чуть старше.
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+PRESETS = {
+    'small': {
+        'users': 1000, 'groups': 20, 'posts': 10000,
+        'comments': 30000, 'follows': 20,
+    },
+    'medium': {
+        'users': 10000, 'groups': 100, 'posts': 100000,
+        'comments': 300000, 'follows': 30,
+    },
+    'large': {
+        'users': 100000, 'groups': 500, 'posts': 1000000,
+        'comments': 3000000, 'follows': 50,
+    },
+}
+
+WORDS = (
+    'лето море город утро книга дорога друг кофе поезд дождь ветер '
+    'музыка вечер работа дом сад осень снег река горы лес небо окно '
+    'история фото прогулка праздник код кот собака чай мост парк'
+).split()
+
+# План текущей генерации; дочерние процессы получают его через fork
+# или, при spawn, из seeding_worker.init.
+_plan = None
+
+
+def zipf_weights(count, alpha=ZIPF_ALPHA):
+    """Накопленные веса Ципфа для random.choices(cum_weights=...)."""
+    total = 0.0
+    weights = []
+    for rank in range(1, count + 1):
+        total += rank ** -alpha
+        weights.append(total)
+    return weights
+
+
+class SkewedChoice:
+    """Выбор из population с весами Ципфа по случайно переставленным
+    рангам, чтобы популярность не совпадала с порядком id."""
+
+    def __init__(self, population, rng, alpha=ZIPF_ALPHA):
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.weights = zipf_weights(len(self.population), alpha)
+
+    def pick(self, rng, k=1):
+        return rng.choices(self.population, cum_weights=self.weights, k=k)
+
+
+class Plan:
+    """Параметры и уже известные id, нужные генераторам пачек."""
+
+    def __init__(self, seed, posts, comments, follows, chunk_size, days,
+                 images, now=EPOCH):
+        self.seed = seed
+        self.posts = posts
+        self.comments = comments
+        self.follows = follows
+        self.chunk_size = chunk_size
+        self.images = images
+        self.image_names = []
+        self.now = now
+        self.start = self.now - timedelta(days=days)
+        self.step = (self.now - self.start) / max(posts, 1)
+        self.user_ids = []
+        self.post_ids = []
+        self.authors = self.celebrities = self.topics = None
+        self.discussed = None
+
+    def rng(self, *parts):
+        return random.Random(':'.join(map(str, (self.seed,) + parts)))
+
+    def chunks(self, total):
+        return range((total + self.chunk_size - 1) // self.chunk_size)
+
+    def bounds(self, chunk, total):
+        first = chunk * self.chunk_size
+        return first, min(first + self.chunk_size, total)
+
+    def post_date(self, number):
+        # Посты идут по времени в порядке вставки, как в живой базе.
+        return self.start + self.step * number
+
+
+def text(rng, min_words=5, max_words=40):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(min_words, max_words)))
+
+
+def _post_rows(plan, chunk):
+    rng = plan.rng('posts', chunk)
+    rows = []
+    for number in range(*plan.bounds(chunk, plan.posts)):
+        group_id = None
+        if plan.topics and rng.random() >= NO_GROUP_SHARE:
+            group_id = plan.topics.pick(rng)[0]
+        image = ''
+        if plan.image_names and rng.random() < plan.images:
+            image = rng.choice(plan.image_names)
+        rows.append((
+            text(rng), plan.authors.pick(rng)[0], group_id,
+            plan.post_date(number), image,
+        ))
+    return rows
+
+
+def _comment_rows(plan, chunk):
+    rng = plan.rng('comments', chunk)
+    first, last = plan.bounds(chunk, plan.comments)
+    rows = []
+    for number in plan.discussed.pick(rng, last - first):
+        delay = timedelta(hours=rng.expovariate(1 / 24))
+        rows.append((
+            plan.post_ids[number], plan.authors.pick(rng)[0],
+            text(rng, 1, 15), min(plan.post_date(number) + delay, plan.now),
+        ))
+    return rows
+
+
+def _follow_rows(plan, chunk):
+    rng = plan.rng('follows', chunk)
+    first, last = plan.bounds(chunk, len(plan.user_ids))
+    rows = []
+    for user_id in plan.user_ids[first:last]:
+        # Число подписок тоже скошено: среднее follows,
+        # у большинства меньше, у немногих — сотни.
+        count = min(
+            int(rng.expovariate(1 / plan.follows)),
+            len(plan.user_ids) - 1,
+        )
+        chosen = set(plan.celebrities.pick(rng, count)) - {user_id}
+        rows.extend((user_id, author_id) for author_id in sorted(chosen))
+    return rows
+
+
+def _generate(generator, chunk):
+    return generator(_plan, chunk)
+
+
+def generate(generator, total, workers=0):
+    """Пачки строк по порядку номеров; с workers — из пула процессов."""
+    tasks = _plan.chunks(total)
+    if not workers:
+        yield from map(partial(_generate, generator), tasks)
+        return
+    with _pool(workers) as pool:
+        yield from pool.imap(partial(_generate, generator), tasks)
+
+
+def _pool(workers):
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # Пул создаётся после заполнения плана, и воркеры получают его
+        # при fork без сериализации.
+        return multiprocessing.get_context('fork').Pool(workers)
+    return multiprocessing.get_context('spawn').Pool(
+        workers, initializer=seeding_worker.init,
+        initargs=(pickle.dumps(_plan),))
+
+
+def insert_batch_size(model):
+    """Строк в одном INSERT для bulk_create.
+
+    Django 2.2 делит вставку в SQLite по 999 параметров, хотя реальные
+    пределы — 500 строк в составном SELECT и SQLITE_LIMIT_VARIABLE_NUMBER
+    (обычно 32766): для постов это 500 строк в INSERT вместо 166.
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    fields = len(model._meta.concrete_fields) - 1
+    connection.ensure_connection()
+    getlimit = getattr(connection.connection, 'getlimit', None)
+    variables = (
+        getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) if getlimit else 999)
+    return max(1, min(500, variables // fields))
+
+
+def insert_rows(model, build, chunks, progress=None):
+    """Вставляет пачки строк и возвращает id новых строк по порядку.
+
+    Вызывается внутри explicit_dates(), чтобы сгенерированные даты не
+    подменялись текущим временем. SQLite не возвращает id из
+    bulk_create, поэтому они читаются по диапазону после вставки (её
+    выполняет один процесс в транзакции).
+    """
+    before = model.objects.order_by('-pk').values_list(
+        'pk', flat=True).first() or 0
+    total = 0
+    for rows in chunks:
+        model.objects.bulk_create(
+            [build(*row) for row in rows],
+            batch_size=insert_batch_size(model))
+        total += len(rows)
+        if progress is not None:
+            progress(model._meta.model_name, total)
+    return list(model.objects.filter(pk__gt=before).order_by(
+        'pk').values_list('pk', flat=True))
+
+
+@contextmanager
+def explicit_dates(*models):
+    """Отключает auto_now и auto_now_add у полей models на время вставки.
+
+    Иначе bulk_create через pre_save() записал бы вместо
+    сгенерированных дат текущее время.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """Снимает индексы Meta.indexes на время вставки и строит их в конце.
+
+    Одна сортировка при CREATE INDEX дешевле, чем обновлять B-дерево на
+    каждую строку. Используется внутри транзакции: при ошибке откат
+    вернёт снятые индексы сам.
+    """
+    editor = connection.schema_editor()
+    indexes = [
+        (model, index) for model in models for index in model._meta.indexes
+    ]
+    with connection.cursor() as cursor:
+        for model, index in indexes:
+            cursor.execute(str(index.remove_sql(model, editor)))
+    yield
+    with connection.cursor() as cursor:
+        for model, index in indexes:
+            cursor.execute(str(index.create_sql(model, editor)))
+
+
+def seed_images(rng, count=SEED_IMAGES):
+    """Небольшой набор картинок, которые посты делят между собой."""
+    names = []
+    for number in range(count):
+        name = f'posts/seed_{number}.jpg'
+        if not default_storage.exists(name):
+            color = tuple(rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', SEED_IMAGE_SIZE, color).save(buffer, 'JPEG')
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        names.append(name)
+    return names
+
+
+def seed(users, groups, posts, comments, follows, seed=0,
+         chunk_size=CHUNK_SIZE, days=DAYS, images=0.0, workers=0,
+         progress=None, now=EPOCH):
+    """Генерирует данные и возвращает число созданных объектов по типам.
+
+    follows — среднее число подписок на пользователя, images — доля
+    постов с картинкой, workers — число процессов для генерации строк
+    (0 — всё в текущем процессе), progress(model_name, count) — для
+    вывода хода работы, now — момент, от которого отсчитываются даты.
+    """
+    global _plan
+    plan = Plan(
+        seed, posts, comments, follows, chunk_size, days, images, now)
+    prefix = f'seed{seed}'
+    if images:
+        plan.image_names = seed_images(plan.rng('images'))
+    _plan = plan
+    try:
+        with transaction.atomic(), explicit_dates(Post, Comment), \
+                deferred_indexes(Post, Comment, Follow):
+            password = make_password(None)
+            plan.user_ids = insert_rows(User, lambda number: User(
+                username=f'{prefix}_user{number}', password=password,
+                date_joined=plan.start,
+            ), [[(number,) for number in range(users)]], progress)
+            group_ids = insert_rows(Group, lambda number: Group(
+                title=f'Группа {number}',
+                slug=f'{prefix}-group-{number}',
+                description=f'Сгенерированная группа {number}',
+            ), [[(number,) for number in range(groups)]], progress)
+            if not plan.user_ids:
+                plan.posts = plan.comments = plan.follows = 0
+
+            plan.authors = SkewedChoice(plan.user_ids, plan.rng('authors'))
+            # Популярность у читателей не связана с плодовитостью: иначе
+            # самый активный автор был бы ещё и у всех в подписках.
+            plan.celebrities = SkewedChoice(
+                plan.user_ids, plan.rng('celebrities'))
+            if group_ids:
+                plan.topics = SkewedChoice(group_ids, plan.rng('topics'))
+            plan.post_ids = insert_rows(Post, lambda *row: Post(
+                text=row[0], author_id=row[1], group_id=row[2],
+                pub_date=row[3], updated=row[3], image=row[4],
+            ), generate(_post_rows, plan.posts, workers), progress)
+
+            if not plan.post_ids:
+                plan.comments = 0
+            plan.discussed = SkewedChoice(
+                range(len(plan.post_ids)), plan.rng('discussed'))
+            comment_ids = insert_rows(Comment, lambda *row: Comment(
+                post_id=row[0], author_id=row[1], text=row[2],
+                created=row[3],
+            ), generate(_comment_rows, plan.comments, workers), progress)
+
+            follow_ids = insert_rows(Follow, lambda *row: Follow(
+                user_id=row[0], author_id=row[1],
+            ), generate(
+                _follow_rows, len(plan.user_ids) if plan.follows else 0,
+                workers,
+            ), progress)
+    finally:
+        _plan = None
+    finalize()
+    return {
+        'users': len(plan.user_ids),
+        'groups': len(group_ids),
+        'posts': len(plan.post_ids),
+        'comments': len(comment_ids),
+        'follows': len(follow_ids),
+    }
+
+
+def finalize():
+    """Пересобирает то, что обычно поддерживают сигналы posts."""
+    timeline.rebuild()
+    counters.reconcile_all()
+    search.rebuild()
+    recommendations.rebuild()
@@ -0,0 +1,15 @@
+"""Запуск воркера posts.seeding на платформах без fork.
+
+При spawn дочерний процесс начинает с чистого интерпретатора, поэтому
+этот модуль не импортирует модели: сначала настраивается Django, и
+только потом распаковывается план генерации.
+"""
+import pickle
+
+import django
+
+
+def init(state):
+    django.setup()
+    from . import seeding
+    seeding._plan = pickle.loads(state)
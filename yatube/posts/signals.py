@@ -0,0 +1,142 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import author_tag, group_tag, post_tag
+from core.thumbnails import thumbnail_ready
+from . import counters, recommendations, search, timeline
+from .caching import bump_feed_generation, bump_follow_generation
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def drop_after_commit(*tags):
+    """Сбрасывает теги кеша после коммита текущей транзакции, чтобы
+    читатель не закешировал заново ещё не закоммиченное старое."""
+    transaction.on_commit(partial(cache.invalidate_tags, *tags))
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+    bump_follow_generation(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_prune(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+    bump_follow_generation(instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_generation()
+
+
+@receiver(post_save, sender=User)
+def user_stats_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_count_up(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counters(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_count_down(sender, instance, **kwargs):
+    counters.change_user_counters(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count_up(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_count_down(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_count_up(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counters(instance.user_id, following_count=1)
+        counters.change_user_counters(instance.author_id, followers_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_count_down(sender, instance, **kwargs):
+    counters.change_user_counters(instance.user_id, following_count=-1)
+    counters.change_user_counters(instance.author_id, followers_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_recommendations(sender, instance, created, **kwargs):
+    if created:
+        recommendations.follow_changed(
+            instance.user_id, instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_recommendations(sender, instance, **kwargs):
+    recommendations.follow_changed(instance.user_id, instance.author_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def post_index(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindex(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_card_drop(sender, instance, **kwargs):
+    drop_after_commit(post_tag(instance.pk))
+
+
+@receiver(thumbnail_ready)
+def thumbnail_cards_drop(sender, name, post_ids, **kwargs):
+    # Карточка и страницы лент с исходником вместо миниатюры иначе
+    # жили бы до конца своего таймаута.
+    if post_ids:
+        cache.invalidate_tags(*(post_tag(pk) for pk in post_ids))
+    bump_feed_generation()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_cards_drop(sender, instance, **kwargs):
+    # Карточки показывают название и адрес группы, а updated у постов
+    # при этом не меняется.
+    drop_after_commit(group_tag(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def author_cards_drop(sender, instance, created, update_fields=None,
+                      **kwargs):
+    # Вход пользователя сохраняет только last_login — карточки целы.
+    if created or (update_fields and 'username' not in update_fields):
+        return
+    drop_after_commit(author_tag(instance.pk))
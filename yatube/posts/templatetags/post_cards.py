@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.fragments import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(name='post_cards')
+def post_cards(posts):
+    """{% post_cards page_obj as cards %} — карточки из кеша фрагментов."""
+    return [mark_safe(card) for card in render_cards(posts)]
@@ -0,0 +1,170 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..archive import archive_before, horizon
+from ..counters import reconcile_all
+from ..models import (ArchivedComment, ArchivedPost, Comment, Follow, Group,
+                      Post, TimelineEntry, UserStats)
+from ..paginators import MergedCursorPaginator
+
+User = get_user_model()
+HOT = 12
+COLD = 10
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        now = timezone.now()
+        for number in range(HOT + COLD):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(days=HOT + COLD - number, hours=-1))
+        cls.old_post = Post.objects.order_by('pub_date').first()
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.old_post, author=cls.reader, text=f'Коммент {number}')
+        cls.threshold = now - timedelta(days=HOT)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_archive_moves_posts_and_comments(self):
+        """Старые посты с комментариями уходят в архив пачками"""
+        self.assertEqual(
+            archive_before(self.threshold, chunk_size=3), (COLD, 3))
+        self.assertEqual(Post.objects.count(), HOT)
+        self.assertEqual(ArchivedPost.objects.count(), COLD)
+        self.assertEqual(
+            ArchivedComment.objects.filter(post=self.old_post.pk).count(), 3)
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            post_id=self.old_post.pk).exists())
+        self.assertEqual(horizon(), ArchivedPost.objects.latest(
+            'pub_date').pub_date)
+
+        reconcile_all()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, HOT + COLD)
+        self.assertEqual(archive_before(self.threshold), (0, 0))
+
+    def test_feeds_read_hot_and_archive(self):
+        """Профиль и группа листаются курсором через архив без пропусков"""
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-pk').values_list('pk', flat=True))
+        archive_before(self.threshold)
+        for url in (
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:group_posts', args=[self.group.slug]),
+        ):
+            with self.subTest(url=url):
+                ids = []
+                cursor = ''
+                while cursor is not None:
+                    response = self.client.get(url, {'cursor': cursor})
+                    page = response.context['page_obj']
+                    ids += [post.pk for post in page]
+                    cursor = page.next_cursor
+                self.assertEqual(ids, expected)
+
+    def test_first_page_skips_archive(self):
+        """Пока страница целиком из горячих постов, архив не читается"""
+        archive_before(self.threshold)
+        paginator = MergedCursorPaginator(
+            [Post.objects.all(), ArchivedPost.objects.all()],
+            newest=[None, horizon()])
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.get_page(None)
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(any(post.is_archived for post in page))
+        page = paginator.get_page(page.next_cursor)
+        self.assertTrue(any(post.is_archived for post in page))
+
+    def test_archived_post_detail(self):
+        """Архивный пост открывается по тому же адресу, только для чтения"""
+        archive_before(self.threshold)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old_post.pk]))
+        self.assertContains(response, self.old_post.text)
+        self.assertContains(response, 'Коммент 2')
+        self.assertIsNone(response.context['form'])
+
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.old_post.pk]))
+        self.assertContains(response, 'Коммент 0')
+
+        response = self.client.get(reverse('posts:post_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_api_reads_archive(self):
+        """API отдаёт архивные посты, их комментарии и ленты с архивом"""
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-pk').values_list('pk', flat=True))
+        archive_before(self.threshold)
+        pk = self.old_post.pk
+
+        data = self.client.get(reverse('api:post_detail', args=[pk])).json()
+        self.assertEqual(data['text'], self.old_post.text)
+        url = reverse('api:comments', args=[pk])
+        data = self.client.get(url, {'fields': 'text'}).json()
+        self.assertEqual(
+            [item['text'] for item in data['results']],
+            ['Коммент 0', 'Коммент 1', 'Коммент 2'])
+        response = self.client.post(url, {'text': 'Поздно'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(
+            ArchivedComment.objects.filter(text='Поздно').exists())
+
+        for url in (
+            reverse('api:author_posts', args=[self.author.username]),
+            reverse('api:group_posts', args=[self.group.slug]),
+        ):
+            with self.subTest(url=url):
+                ids = []
+                cursor = ''
+                while cursor is not None:
+                    data = self.client.get(
+                        url, {'cursor': cursor, 'fields': 'id'}).json()
+                    ids += [item['id'] for item in data['results']]
+                    cursor = data['next_cursor']
+                self.assertEqual(ids, expected)
+
+    def test_archived_posts_leave_search(self):
+        """Архивные посты пропадают из поиска, горячие остаются"""
+        url = reverse('posts:search_json')
+        archive_before(self.threshold)
+        ids = set()
+        cursor = ''
+        while cursor is not None:
+            data = self.client.get(
+                url, {'q': 'Пост', 'cursor': cursor}).json()
+            ids.update(item['id'] for item in data['results'])
+            cursor = data['next_cursor']
+        self.assertEqual(
+            ids, set(Post.objects.values_list('pk', flat=True)))
+        self.assertNotIn(self.old_post.pk, ids)
+
+    def test_command(self):
+        """Команда archive_posts переносит посты старше --older-than"""
+        out = StringIO()
+        call_command('archive_posts', older_than=HOT, stdout=out)
+        self.assertIn(f'{COLD} постов', out.getvalue())
@@ -0,0 +1,68 @@
+import threading
+
+from django.http import HttpResponse
+from django.test import TestCase
+
+from posts import benchmark, seeding
+
+
+class BenchmarkTest(TestCase):
+    def test_percentile(self):
+        """Перцентиль по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([], 95), 0.0)
+
+    def test_compare_reports_regressions(self):
+        """Рост p95 и падение rps сверх допуска считаются регрессией"""
+        baseline = {'scenarios': {
+            'index': {'p95': 0.010, 'rps': 100.0},
+            'profile': {'p95': 0.010, 'rps': 100.0},
+        }}
+        results = {
+            'index': {'p95': 0.011, 'rps': 95.0},
+            'profile': {'p95': 0.020, 'rps': 50.0},
+            'post_detail': {'p95': 1.0, 'rps': 1.0},
+        }
+        self.assertEqual(
+            benchmark.compare(results, baseline, tolerance=0.2),
+            [
+                ('profile', 'p95', 0.010, 0.020),
+                ('profile', 'rps', 100.0, 50.0),
+            ],
+        )
+
+    def test_scenarios_run_on_seeded_data(self):
+        """Все сценарии выполняются на засеянной базе без ошибок"""
+        seeding.seed(
+            users=20, groups=2, posts=100, comments=100, follows=5)
+        for scenario in benchmark.build_scenarios():
+            with self.subTest(scenario=scenario.name):
+                result = benchmark.run(scenario, requests=3, warmup=1)
+                self.assertEqual(result['requests'], 3)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['p99'], 0)
+
+    def test_warmup_error_does_not_hang(self):
+        """Ошибка прогрева в одном потоке прерывает прогон,
+        а не оставляет остальные ждать у барьера"""
+        class Broken:
+            name = 'broken'
+
+            def __init__(self):
+                self.clients = 0
+                self.lock = threading.Lock()
+
+            def client(self):
+                with self.lock:
+                    self.clients += 1
+                    if self.clients == 2:
+                        raise RuntimeError('прогрев упал')
+                return None
+
+            def send(self, client):
+                return HttpResponse()
+
+        with self.assertRaisesMessage(RuntimeError, 'прогрев упал'):
+            benchmark.run(Broken(), requests=4, concurrency=3, warmup=1)
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TransactionTestCase):
+    """Без обёртки TestCase в транзакцию: ETag меняется после коммита
+    записи, а в TestCase коммит не наступает."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:main_page'),
+            'group_posts': reverse(
+                'posts:group_posts', kwargs={'slug': self.group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': self.author.username}),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}),
+        }
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_page_not_modified(self):
+        """Повторный запрос неизменной страницы получает 304"""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('ETag', response)
+                self.assertNotIn('Last-Modified', response)
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertIn('private', response['Cache-Control'])
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 304)
+
+    def test_if_modified_since_only(self):
+        """Запрос только с If-Modified-Since после правки получает 200"""
+        url = self.urls['post_detail']
+        since = http_date(timezone.now().timestamp() + 60)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный текст')
+
+    def test_new_post_changes_feeds(self):
+        """Новый пост обновляет ленты автора и группы"""
+        responses = {
+            name: self.client.get(url) for name, url in self.urls.items()
+        }
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост')
+        for name in ('index', 'group_posts', 'profile'):
+            with self.subTest(page=name):
+                response = self.revalidate(
+                    self.urls[name], responses[name])
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Новый пост')
+
+    def test_edit_changes_etag(self):
+        """Правка поста не меняет даты публикации, но меняет ETag"""
+        url = self.urls['post_detail']
+        response = self.client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный текст')
+
+    def test_follow_changes_profile(self):
+        """Подписка меняет кнопку и счётчики на странице автора"""
+        url = self.urls['profile']
+        response = self.client.get(url)
+        self.client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Чужой ETag не подходит другому пользователю"""
+        url = self.urls['index']
+        response = self.client.get(url)
+        self.assertEqual(
+            self.revalidate(url, response, Client()).status_code, 200)
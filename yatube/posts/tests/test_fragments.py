@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from .. import fragments
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTest(TransactionTestCase):
+    """Карточки сбрасываются после коммита, поэтому без обёртки
+    TestCase в транзакцию."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Старое название', slug='group', description='Описание')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {number}')
+            for number in range(3)
+        ]
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def render(self):
+        return fragments.render_cards(
+            Post.objects.select_related('author', 'group'))
+
+    def test_cards_rendered_once(self):
+        """Повторная страница собирается из кеша без рендера карточек"""
+        with mock.patch.object(fragments, 'render_card',
+                               wraps=fragments.render_card) as render:
+            first = self.render()
+            self.assertEqual(render.call_count, 3)
+            self.assertEqual(self.render(), first)
+            self.assertEqual(render.call_count, 3)
+
+    def test_missing_cards_stored_in_one_write(self):
+        """Недостающие карточки страницы пишутся в кеш одним set_many"""
+        with mock.patch.object(cache, 'set_many',
+                               wraps=cache.set_many) as set_many, \
+                mock.patch.object(cache, 'set') as set_one:
+            self.render()
+        self.assertEqual(set_many.call_count, 1)
+        set_one.assert_not_called()
+
+    def test_edit_rerenders_only_edited_card(self):
+        """Правка поста меняет updated, и перерисовывается только он"""
+        self.render()
+        post = self.posts[0]
+        old_updated = post.updated
+        response = self.client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            {'text': 'Исправленный текст', 'group': self.group.pk})
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertGreater(post.updated, old_updated)
+
+        with mock.patch.object(fragments, 'render_card',
+                               wraps=fragments.render_card) as render:
+            cards = self.render()
+        self.assertEqual(render.call_count, 1)
+        self.assertTrue(any('Исправленный текст' in card for card in cards))
+
+    def test_feeds_share_cards(self):
+        """Группа, профиль и главная показывают одну карточку"""
+        pages = [
+            reverse('posts:main_page'),
+            reverse('posts:group_posts', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+        ]
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(
+                    response, reverse('posts:post_detail',
+                                      args=[self.posts[0].pk]))
+                self.assertContains(response, 'Старое название')
+
+    def test_group_rename_drops_cards(self):
+        """Переименование группы сбрасывает карточки её постов"""
+        self.render()
+        self.group.title = 'Новое название'
+        self.group.save()
+        cards = self.render()
+        self.assertTrue(all('Новое название' in card for card in cards))
+
+    def test_cards_dropped_after_commit(self):
+        """Карточки группы сбрасываются только после коммита"""
+        self.render()
+        with transaction.atomic():
+            self.group.title = 'Новое название'
+            self.group.save()
+            self.assertTrue(
+                all('Старое название' in card for card in self.render()))
+        self.assertTrue(
+            all('Новое название' in card for card in self.render()))
@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.query_budget import QueryBudgetExceeded, query_budget
+from .. import views
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTest(TestCase):
+    """Каждая страница укладывается в свой бюджет запросов на наборе
+    данных, где N+1 сразу дал бы десятки лишних запросов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [User.objects.create_user(f'user{i}') for i in range(6)]
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for i in range(30):
+            Post.objects.create(
+                author=cls.users[i % 5 + 1],
+                group=cls.group if i % 2 else None,
+                text=f'Пост номер {i}',
+            )
+        cls.post = Post.objects.filter(author=cls.users[1]).first()
+        for user in cls.users:
+            Comment.objects.create(post=cls.post, author=user, text='Текст')
+        for author in cls.users[1:]:
+            Follow.objects.create(user=cls.users[0], author=author)
+        cls.own_post = Post.objects.create(author=cls.users[0], text='Мой')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.users[0])
+
+    def assertWithinBudget(self, response, view):
+        self.assertLessEqual(
+            response.wsgi_request.query_count, view.query_budget)
+
+    def request(self, method, url, queries, data=None):
+        """Запрос с точным числом SQL-запросов, включая сессию и
+        пользователя: бюджет ловит только рост сверх потолка, а здесь
+        заметно любое изменение."""
+        with self.assertNumQueries(queries):
+            return getattr(self.client, method)(url, data)
+
+    def test_read_views_within_budget(self):
+        """Страницы чтения, в том числе старые ссылки ?page=N"""
+        pages = [
+            (views.index, reverse('posts:main_page'), 3),
+            (views.group_posts, reverse(
+                'posts:group_posts', kwargs={'slug': self.group.slug}), 5),
+            (views.profile, reverse(
+                'posts:profile', kwargs={'username': self.users[1].username}),
+             8),
+            (views.post_detail, reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}), 4),
+            (views.post_comments, reverse(
+                'posts:post_comments', kwargs={'post_id': self.post.id}), 2),
+            (views.follow_index, reverse('posts:follow_index'), 4),
+            (views.post_search, reverse('posts:search') + '?q=пост', 4),
+            (views.post_search_json,
+             reverse('posts:search_json') + '?q=пост', 2),
+            # Старые ссылки ?page=N.
+            (views.index, reverse('posts:main_page') + '?page=2', 4),
+            (views.follow_index,
+             reverse('posts:follow_index') + '?page=2', 5),
+        ]
+        for view, url, queries in pages:
+            with self.subTest(url=url):
+                response = self.request('get', url, queries)
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinBudget(response, view)
+
+    def test_write_views_within_budget(self):
+        """Публикация, правка, комментарий и подписки"""
+        author = self.users[1].username
+        actions = [
+            (views.post_create, reverse('posts:post_create'),
+             {'text': 'Новый', 'group': self.group.id}, 11),
+            (views.post_edit, reverse(
+                'posts:post_edit', kwargs={'post_id': self.own_post.id}),
+             {'text': 'Исправленный'}, 8),
+            (views.add_comment, reverse(
+                'posts:add_comment', kwargs={'post_id': self.post.id}),
+             {'text': 'Комментарий'}, 7),
+            (views.profile_unfollow, reverse(
+                'posts:profile_unfollow', kwargs={'username': author}), {},
+             13),
+            (views.profile_follow, reverse(
+                'posts:profile_follow', kwargs={'username': author}), {}, 18),
+        ]
+        for view, url, data, queries in actions:
+            with self.subTest(url=url):
+                response = self.request('post', url, queries, data)
+                self.assertEqual(response.status_code, 302)
+                self.assertWithinBudget(response, view)
+
+    def test_exceeding_budget_raises(self):
+        """Превышение бюджета — исключение при QUERY_BUDGET_RAISE"""
+        @query_budget(0)
+        def view(request):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return HttpResponse()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            view(RequestFactory().get('/'))
+
+
+@override_settings(QUERY_BUDGET_RAISE=True, DATABASE_REPLICAS=['replica'])
+class ReplicaQueryBudgetTest(TestCase):
+    databases = {'default', 'replica'}
+
+    def test_replica_queries_counted(self):
+        """Запросы к реплике тоже входят в бюджет"""
+        @query_budget(1)
+        def view(request):
+            for alias in ('default', 'replica'):
+                with connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            return HttpResponse()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            view(RequestFactory().get('/'))
+
+        # Гость читает главную с реплики: без её запросов счётчик был бы 0.
+        cache.clear()
+        response = Client().get(reverse('posts:main_page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.wsgi_request.query_count, 0)
+        self.assertLessEqual(
+            response.wsgi_request.query_count, views.index.query_budget)
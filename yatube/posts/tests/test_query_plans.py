@@ -0,0 +1,79 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(
+    r'SCAN (TABLE )?\w+\b(?! USING (COVERING )?INDEX)')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class QueryPlanTest(TestCase):
+    """Запросы страниц ленты идут по индексам, без полного сканирования
+    таблиц и без сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(f'user{i}') for i in range(10)
+        ]
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}')
+            for i in range(5)
+        ]
+        Post.objects.bulk_create(
+            Post(
+                text=f'Пост {i}',
+                author=cls.users[i % len(cls.users)],
+                group=cls.groups[i % len(cls.groups)] if i % 3 else None,
+            )
+            for i in range(500)
+        )
+        cls.post = Post.objects.filter(author=cls.users[0]).first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=user, text='Комментарий')
+            for user in cls.users
+        )
+        for author in cls.users[1:4]:
+            Follow.objects.create(user=cls.users[0], author=author)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.users[0])
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_views_use_indexes(self):
+        """Каждый запрос страниц ленты использует индекс"""
+        urls = [
+            reverse('posts:main_page'),
+            reverse('posts:group_posts', kwargs={
+                'slug': self.groups[0].slug}),
+            reverse('posts:profile', kwargs={
+                'username': self.users[1].username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                for step in self.explain(query['sql']):
+                    with self.subTest(url=url, sql=query['sql'], step=step):
+                        self.assertIsNone(FULL_SCAN.search(step))
+                        self.assertNotIn(TEMP_SORT, step)
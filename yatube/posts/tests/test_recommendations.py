@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post, Recommendation
+from ..recommendations import rebuild
+
+User = get_user_model()
+
+
+class RecommendationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'friend', 'fan', 'writer', 'poet', 'star', 'other')
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names
+        }
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.users['reader'])
+
+    def follow(self, user, author):
+        Follow.objects.create(
+            user=self.users[user], author=self.users[author])
+
+    def scores(self, user):
+        return dict(Recommendation.objects.filter(
+            user=self.users[user]).values_list('author__username', 'score'))
+
+    def test_friends_of_friends_and_groups(self):
+        """Друзья друзей весят по числу путей, лидеры групп — меньше"""
+        self.follow('reader', 'friend')
+        self.follow('reader', 'fan')
+        self.follow('friend', 'writer')
+        self.follow('fan', 'writer')
+        self.follow('friend', 'poet')
+        self.follow('friend', 'reader')
+        self.follow('other', 'star')
+        self.follow('writer', 'star')
+        Post.objects.create(
+            author=self.users['reader'], group=self.group, text='Пост')
+        Post.objects.create(
+            author=self.users['star'], group=self.group, text='Пост')
+
+        rebuild(chunk_size=2)
+        self.assertEqual(
+            self.scores('reader'), {'writer': 2, 'poet': 1, 'star': 0.5})
+        self.assertEqual(self.scores('friend'), {'fan': 1, 'star': 1})
+
+    def test_incremental_updates_match_rebuild(self):
+        """Подписка и отписка через сайт дают тот же список, что rebuild"""
+        self.follow('friend', 'writer')
+        self.follow('friend', 'poet')
+        self.follow('fan', 'reader')
+        rebuild()
+        self.client.get(reverse(
+            'posts:profile_follow', args=[self.users['friend'].username]))
+        self.client.get(reverse(
+            'posts:profile_follow', args=[self.users['writer'].username]))
+        incremental = {name: self.scores(name) for name in self.users}
+        self.assertEqual(incremental['reader'], {'poet': 1})
+        self.assertEqual(incremental['fan'], {'friend': 1, 'writer': 1})
+        rebuild()
+        self.assertEqual(
+            {name: self.scores(name) for name in self.users}, incremental)
+
+        self.client.get(reverse(
+            'posts:profile_unfollow', args=[self.users['friend'].username]))
+        self.assertEqual(self.scores('reader'), {})
+        self.assertEqual(self.scores('fan'), {'writer': 1})
+
+    def test_pages_show_recommendations(self):
+        """Блок «Кого почитать» есть в ленте подписок и в профиле"""
+        self.follow('reader', 'friend')
+        self.follow('friend', 'writer')
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', args=[self.users['poet'].username]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Кого почитать')
+                self.assertEqual(
+                    [item.author for item in
+                     response.context['recommendations']],
+                    [self.users['writer']])
+
+    def test_command(self):
+        """Команда rebuild_recommendations пересобирает таблицу"""
+        self.follow('reader', 'friend')
+        self.follow('friend', 'writer')
+        Recommendation.objects.all().delete()
+        call_command('rebuild_recommendations', stdout=StringIO())
+        self.assertEqual(self.scores('reader'), {'writer': 1})
@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import FTS_TABLE, build_match
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.other = User.objects.create_user('Other')
+        cls.group = Group.objects.create(title='Группа', slug='slug')
+        cls.cats = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Коты и кошки: коты спят весь день')
+        cls.dogs = Post.objects.create(
+            author=cls.other, text='Собаки любят гулять, коты нет')
+        cls.birds = Post.objects.create(
+            author=cls.other, text='Птицы поют по утрам')
+
+    def setUp(self):
+        self.client = Client()
+
+    def search_ids(self, **params):
+        response = self.client.get(reverse('posts:search_json'), params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_search_ranks_and_filters(self):
+        """Поиск находит посты по словам, ранжирует и фильтрует"""
+        self.assertEqual(
+            self.search_ids(q='коты'), [self.cats.pk, self.dogs.pk])
+        self.assertEqual(
+            self.search_ids(q='коты', group=self.group.slug), [self.cats.pk])
+        self.assertEqual(
+            self.search_ids(q='коты', author=self.other.username),
+            [self.dogs.pk])
+
+    def test_search_page_renders_results(self):
+        """Страница поиска показывает найденные посты"""
+        response = self.client.get(reverse('posts:search'), {'q': 'птиц'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertTemplateUsed(response, 'posts/includes/post_cards.html')
+        self.assertEqual(response.context['results'], [self.birds])
+
+    def test_search_cursor_pagination(self):
+        """Курсор следующей страницы продолжает выдачу без повторов"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Коты номер {i}')
+            for i in range(12)
+        )
+        call_command('rebuild_search_index', batch_size=5, stdout=StringIO())
+        url = reverse('posts:search_json')
+        first = self.client.get(url, {'q': 'коты'}).json()
+        second = self.client.get(
+            url, {'q': 'коты', 'cursor': first['next_cursor']}).json()
+        ids = [item['id'] for item in first['results'] + second['results']]
+        self.assertEqual(len(ids), 14)
+        self.assertEqual(len(set(ids)), 14)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при редактировании и удалении поста"""
+        post = Post.objects.get(pk=self.birds.pk)
+        post.text = 'Рыбы молчат'
+        post.save()
+        self.assertEqual(self.search_ids(q='птицы'), [])
+        self.assertEqual(self.search_ids(q='рыбы'), [post.pk])
+        post.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 во вводе не ломают запрос"""
+        self.assertEqual(
+            build_match('коты AND (" NEAR'), '"коты" "AND" "NEAR"*')
+        self.assertEqual(self.search_ids(q='"('), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс"""
+        queryset, _ = site._registry[Post].get_search_results(
+            None, Post.objects.all(), 'птицы')
+        self.assertIn(FTS_TABLE, str(queryset.query))
+        self.assertEqual(list(queryset), [self.birds])
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from posts import seeding
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserStats)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SIZES = {'users': 30, 'groups': 3, 'posts': 200, 'comments': 300,
+         'follows': 5}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def dataset(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date',
+                'updated')),
+            list(Comment.objects.order_by('pk').values_list(
+                'post__text', 'author__username', 'text', 'created')),
+            list(Follow.objects.order_by('pk').values_list(
+                'user__username', 'author__username')),
+        )
+
+    def reset(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_seed_creates_consistent_data(self):
+        """seed создаёт заданный объём, а ленты и счётчики
+        пересобираются под него"""
+        counts = seeding.seed(chunk_size=64, **SIZES)
+
+        self.assertEqual(counts['posts'], 200)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(counts['follows'], Follow.objects.count())
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            sum(
+                Post.objects.filter(author_id=author_id).count()
+                for author_id in Follow.objects.values_list(
+                    'author_id', flat=True)
+            ),
+        )
+        busiest = UserStats.objects.order_by('-posts_count').first()
+        self.assertEqual(
+            busiest.posts_count,
+            Post.objects.filter(author_id=busiest.user_id).count())
+        # Распределение скошено: у самого активного автора постов
+        # заметно больше среднего.
+        self.assertGreater(busiest.posts_count, 200 / 30 * 2)
+
+    def test_indexes_restored(self):
+        """Снятые на время вставки индексы построены заново"""
+        seeding.seed(**SIZES)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table)
+        for index in Post._meta.indexes:
+            self.assertIn(index.name, constraints)
+
+    def test_deterministic_for_any_worker_count(self):
+        """Один seed даёт одни и те же данные, вместе с датами,
+        с пулом и без"""
+        seeding.seed(seed=3, chunk_size=64, **SIZES)
+        expected = self.dataset()
+        self.reset()
+        seeding.seed(seed=3, chunk_size=64, workers=2, **SIZES)
+        self.assertEqual(self.dataset(), expected)
+
+    def test_spawn_without_fork(self):
+        """Без fork воркеры запускаются через spawn с тем же результатом"""
+        seeding.seed(seed=4, chunk_size=64, **SIZES)
+        expected = self.dataset()
+        self.reset()
+        with mock.patch.object(
+                seeding.multiprocessing, 'get_all_start_methods',
+                return_value=['spawn']):
+            seeding.seed(seed=4, chunk_size=64, workers=2, **SIZES)
+        self.assertEqual(self.dataset(), expected)
+
+    def test_dates_from_now(self):
+        """Даты отсчитываются от now, а не от текущего времени,
+        и auto_now_add их не подменяет"""
+        seeding.seed(**SIZES)
+        newest = Post.objects.order_by('-pub_date').first()
+        self.assertLessEqual(newest.pub_date, seeding.EPOCH)
+        self.assertGreater(
+            newest.pub_date, seeding.EPOCH - timedelta(days=seeding.DAYS))
+        self.assertEqual(newest.updated, newest.pub_date)
+        self.assertLessEqual(
+            Comment.objects.order_by('-created').first().created,
+            seeding.EPOCH)
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        self.assertFalse(User.objects.filter(
+            username__startswith='seed0_',
+            date_joined__gt=newest.pub_date).exists())
+
+        self.reset()
+        call_command(
+            'seed', users=5, posts=10, comments=0, follows=0,
+            now='2020-06-01T12:00:00', stdout=StringIO())
+        self.assertEqual(
+            Post.objects.latest('pub_date').pub_date.year, 2020)
+
+    def test_images(self):
+        """Доля постов получает картинки из общего набора файлов"""
+        seeding.seed(images=0.5, **SIZES)
+        with_image = Post.objects.exclude(image='')
+        self.assertTrue(0 < with_image.count() < 200)
+        self.assertTrue(os.path.exists(with_image.first().image.path))
+
+    def test_command(self):
+        """Команда seed переопределяет объёмы пресета и не даёт
+        повторно использовать seed"""
+        call_command(
+            'seed', users=10, groups=2, posts=50, comments=20, follows=2,
+            stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 50)
+        with self.assertRaises(CommandError):
+            call_command('seed', users=10, posts=0, stdout=StringIO())
+        for options in ({'chunk_size': 0}, {'workers': -1}):
+            with self.subTest(**options):
+                with self.assertRaises(CommandError):
+                    call_command(
+                        'seed', seed=1, users=1, stdout=StringIO(),
+                        **options)
@@ -0,0 +1,125 @@
+import json
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from ..models import Follow, Post
+from ..updates import (MAX_WAIT, Feed, event_stream, notifier, parse_wait,
+                       since_cursor)
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class NewPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.seen = Post.objects.create(author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.since = since_cursor(self.seen)
+
+    def new_posts(self, **params):
+        response = self.client.get(
+            reverse('posts:new_posts'), {'since': self.since, **params})
+        return response.json()
+
+    def test_index_has_since_cursor(self):
+        """Первая страница ленты отдаёт курсор самого нового поста"""
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, f'data-since="{self.since}"')
+
+    def test_count_and_cards(self):
+        """Считаются только посты новее since, карточки — по запросу"""
+        self.assertEqual(self.new_posts(), {'count': 0, 'more': False})
+        Post.objects.create(author=self.author, text='Первый новый')
+        Post.objects.create(author=self.stranger, text='Второй новый')
+        self.assertEqual(self.new_posts(), {'count': 2, 'more': False})
+
+        data = self.new_posts(cards=1)
+        self.assertLess(
+            data['html'].index('Второй новый'),
+            data['html'].index('Первый новый'))
+        self.since = data['since']
+        self.assertEqual(self.new_posts()['count'], 0)
+
+    def test_follow_feed(self):
+        """Лента подписок не считает посты чужих авторов"""
+        Post.objects.create(author=self.stranger, text='Чужой пост')
+        self.assertEqual(self.new_posts(feed='follow')['count'], 0)
+        Post.objects.create(author=self.author, text='Пост автора')
+        data = self.new_posts(feed='follow', cards=1)
+        self.assertEqual(data['count'], 1)
+        self.assertIn('Пост автора', data['html'])
+
+        response = Client().get(
+            reverse('posts:new_posts'),
+            {'since': self.since, 'feed': 'follow'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_bad_since(self):
+        """Без курсора since — ошибка 400"""
+        response = self.client.get(
+            reverse('posts:new_posts'), {'since': 'мусор'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_long_poll_times_out(self):
+        """Long-poll без новых постов отвечает по таймауту"""
+        self.assertEqual(self.new_posts(wait=0.05)['count'], 0)
+
+    def test_wait_clamped(self):
+        """nan, inf и отрицательный ?wait= не вешают воркер"""
+        self.assertEqual(parse_wait('nan'), 0)
+        self.assertEqual(parse_wait('inf'), 0)
+        self.assertEqual(parse_wait('-5'), 0)
+        self.assertEqual(parse_wait('мусор'), 0)
+        self.assertEqual(parse_wait('1e9'), MAX_WAIT)
+        self.assertEqual(parse_wait('0.5'), 0.5)
+        for wait in ('nan', '-inf'):
+            with self.subTest(wait=wait):
+                self.assertEqual(self.new_posts(wait=wait)['count'], 0)
+
+    def test_stream(self):
+        """Поток шлёт событие при изменении числа новых постов"""
+        Post.objects.create(author=self.author, text='Новый пост')
+        events = event_stream(
+            Feed(Post.objects.all()), (self.seen.pub_date, self.seen.pk),
+            poll_interval=0, duration=0)
+        chunks = list(events)
+        self.assertTrue(chunks[0].startswith('retry:'))
+        event, data = chunks[1].strip().split('\n')
+        self.assertEqual(event, 'event: posts')
+        self.assertEqual(
+            json.loads(data[len('data: '):]), {'count': 1, 'more': False})
+
+        response = self.client.get(
+            reverse('posts:new_posts_stream'), {'since': self.since})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+
+class PostNotifierTest(TransactionTestCase):
+    def test_post_create_wakes_waiters(self):
+        """Публикация через post_create будит ожидающих после коммита"""
+        user = User.objects.create_user(username='author')
+        client = Client()
+        client.force_login(user)
+        version = notifier.version
+        woken = []
+        waiter = threading.Thread(
+            target=lambda: woken.append(notifier.wait(version, 5)))
+        waiter.start()
+        client.post(reverse('posts:post_create'), {'text': 'Новый пост'})
+        waiter.join()
+        self.assertNotEqual(woken, [version])
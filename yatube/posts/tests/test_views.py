@@ -1,12 +1,20 @@
+from io import StringIO
+
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from django import forms
 
-from ..models import Follow, Group, Post
+from ..caching import feed_generation
+from ..models import (Comment, Follow, Group, Post, TimelineEntry,
+                      UserStats)
+from ..paginators import CursorPage
 
 User = get_user_model()
 
@@ -220,21 +228,58 @@ class TestViews(TestCase):
         self.assertEqual(post.text, self.post.text)
         self.assertEqual(post.group, self.post.group)
 
+
+class FeedCacheTest(TransactionTestCase):
+    """Кеш лент сбрасывается после коммита записи, поэтому без обёртки
+    TestCase в транзакцию."""
+
+    def setUp(self):
+        cache.clear()
+        self.user_author = User.objects.create_user('Author')
+        self.group = Group.objects.create(slug='slug')
+        self.client = Client()
+        self.client.force_login(self.user_author)
+
     def test_cache_index(self):
-        """Пост при удалении сохраняется в кеше"""
+        """Главная страница отдаётся из кеша, пока данные не изменились,
+        и обновляется сразу после изменения поста"""
+        cache.clear()
         self.post_cache = Post.objects.create(
             author=self.user_author,
             group=self.group,
+            text='Пост для кеша',
         )
         url = reverse('posts:main_page')
         response_1 = self.client.get(url)
-        self.assertContains(response_1, self.post_cache.text)
-        self.post_cache.delete()
+        self.assertContains(response_1, 'Пост для кеша')
+
+        # update() не шлёт сигналов, поэтому кеш о нём не знает.
+        Post.objects.filter(pk=self.post_cache.pk).update(text='Без сигнала')
         response_2 = self.client.get(url)
-        self.assertContains(response_2, self.post_cache.text)
-        cache.clear()
+        self.assertContains(response_2, 'Пост для кеша')
+
+        self.post_cache.delete()
         response_3 = self.client.get(url)
-        self.assertNotEqual(response_1.content, response_3.content)
+        self.assertNotContains(response_3, 'Пост для кеша')
+        self.assertNotContains(response_3, 'Без сигнала')
+
+    def test_generation_changes_after_commit(self):
+        """Поколение лент меняется только после коммита записи: до него
+        читатель видит старые строки и не должен класть их под новый
+        ключ"""
+        before = feed_generation()
+        with transaction.atomic():
+            Post.objects.create(author=self.user_author, text='В транзакции')
+            self.assertEqual(feed_generation(), before)
+        self.assertNotEqual(feed_generation(), before)
+
+    def test_author_sees_new_post_after_create(self):
+        """Автор видит свой пост на главной сразу после публикации"""
+        self.client.get(reverse('posts:main_page'))
+        self.client.post(
+            reverse('posts:post_create'), {'text': 'Свежий пост'})
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'Свежий пост')
 
 
 class PaginatorViewsTest(TestCase):
@@ -348,3 +393,247 @@ class FollowViewsTest(TestCase):
 
         self.assertEqual(count_follow, 1)
         self.assertEqual(count_not_follow, 0)
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user('Author')
+        cls.group = Group.objects.create(
+            slug='slug',
+        )
+        Post.objects.bulk_create(
+            Post(group=cls.group, author=cls.user_author, text=str(i))
+            for i in range(13)
+        )
+        cls.urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_posts', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={
+                    'username': cls.user_author.username}),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user_author)
+        cache.clear()
+
+    def test_cursor_pages_walk_whole_feed(self):
+        """По курсорам next/prev обходим ленту без пропусков и повторов"""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                self.assertEqual(len(first), 10)
+                self.assertFalse(first.has_previous())
+                second = self.client.get(
+                    url, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second), 3)
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    [post.pk for post in first] + [post.pk for post in second],
+                    expected)
+                back = self.client.get(
+                    url, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.pk for post in back], expected[:10])
+
+    def test_cursor_page_skips_count(self):
+        """Курсорная страница не делает COUNT(*)"""
+        first = self.client.get(self.urls[0]).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                self.urls[0], {'cursor': first.next_cursor})
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries))
+
+    def test_cursor_page_navigation(self):
+        """Соседние страницы видны по курсорам, без COUNT(*)"""
+        first = self.client.get(self.urls[0]).context['page_obj']
+        self.assertIsInstance(first, CursorPage)
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_other_pages())
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(
+                self.urls[0], {'cursor': first.next_cursor}
+            ).context['page_obj']
+            self.assertFalse(second.has_next())
+            self.assertTrue(second.has_previous())
+            self.assertTrue(second.has_other_pages())
+            self.assertIsNone(second.start_index())
+            self.assertIsNone(second.next_page_number())
+            self.assertIn('CursorPage 3 objects', repr(second))
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор отдаёт первую страницу"""
+        response = self.client.get(self.urls[0], {'cursor': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user('User_author')
+        cls.user_follower = User.objects.create_user('Follower')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user_follower)
+
+    def test_timeline_fan_out_backfill_and_prune(self):
+        """Лента подписок пополняется при публикации и подписке
+        и очищается при отписке"""
+        old_post = Post.objects.create(author=self.user_author, text='old')
+        self.client.get(reverse('posts:profile_follow', kwargs={
+            'username': self.user_author.username}))
+        new_post = Post.objects.create(author=self.user_author, text='new')
+
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, old_post])
+
+        self.client.get(reverse('posts:profile_unfollow', kwargs={
+            'username': self.user_author.username}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_follower).exists())
+
+    def test_rebuild_timeline_command(self):
+        """Команда rebuild_timeline восстанавливает ленты по подпискам"""
+        Follow.objects.create(user=self.user_follower, author=self.user_author)
+        post = Post.objects.create(author=self.user_author)
+        TimelineEntry.objects.all().delete()
+
+        call_command('rebuild_timeline', stdout=StringIO())
+
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_follower, post=post).exists())
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user('User_author')
+        cls.user_follower = User.objects.create_user('Follower')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user_follower)
+
+    def test_counters_follow_writes(self):
+        """Счётчики постов, комментариев и подписок меняются вместе
+        с данными"""
+        post = Post.objects.create(author=self.user_author)
+        Post.objects.create(author=self.user_author)
+        self.client.get(reverse('posts:profile_follow', kwargs={
+            'username': self.user_author.username}))
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            {'text': 'Комментарий'})
+
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        author_stats = UserStats.objects.get(user=self.user_author)
+        self.assertEqual(author_stats.posts_count, 2)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user_follower).following_count, 1)
+
+        post.delete()
+        self.client.get(reverse('posts:profile_unfollow', kwargs={
+            'username': self.user_author.username}))
+        author_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 0)
+
+    def test_drifted_zero_counters_stay_zero(self):
+        """Удаление при разошедшемся нулевом счётчике не падает
+        и оставляет ноль"""
+        post = Post.objects.create(author=self.user_author)
+        comment = Comment.objects.create(post=post, author=self.user_follower)
+        UserStats.objects.filter(user=self.user_author).update(posts_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.user_author).posts_count, 0)
+
+    def test_reconcile_counters_command(self):
+        """Команда reconcile_counters исправляет разошедшиеся счётчики"""
+        post = Post.objects.create(author=self.user_author)
+        Comment.objects.create(post=post, author=self.user_follower)
+        UserStats.objects.filter(user=self.user_author).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+
+        call_command('reconcile_counters', stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user_author).posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user_follower).posts_count, 0)
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user('Author')
+        cls.post = Post.objects.create(author=cls.user_author)
+        cls.commenters = [
+            User.objects.create_user(f'Commenter{i}') for i in range(25)
+        ]
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=user, text=f'Комментарий {i}')
+            for i, user in enumerate(cls.commenters)
+        )
+        cls.url = reverse('posts:post_detail', kwargs={'post_id': cls.post.id})
+
+    def test_comments_are_paginated_with_load_more(self):
+        """На странице поста первая порция комментариев,
+        остальные — во фрагменте «Показать ещё»"""
+        comments = self.client.get(self.url).context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': comments.next_cursor})
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {i}' for i in range(20, 25)])
+
+    def test_newest_first_order(self):
+        """С order=newest сначала идут новые комментарии"""
+        comments = self.client.get(
+            self.url, {'order': 'newest'}).context['comments']
+        self.assertEqual(comments[0].text, 'Комментарий 24')
+
+    def test_comment_authors_loaded_in_bulk(self):
+        """Число запросов не зависит от числа комментариев"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url, {'order': 'newest'})
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=user, text='Ещё один')
+            for user in self.commenters[:10]
+        )
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url, {'order': 'newest'})
+        self.assertEqual(len(after), len(before))
@@ -0,0 +1,83 @@
+from django.db import connection, transaction
+
+from .models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def fan_out_post(post, batch_size=BATCH_SIZE):
+    """Раскладывает новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    entries = (
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+    _bulk_insert(entries, batch_size)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора.
+
+    Один INSERT … SELECT в самой БД: число запросов не зависит от того,
+    сколько постов у автора.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{connection.ops.insert_statement(ignore_conflicts=True)}'
+            f' {TimelineEntry._meta.db_table}'
+            ' (user_id, post_id, author_id, pub_date)'
+            ' SELECT %s, id, author_id, pub_date'
+            f' FROM {Post._meta.db_table} WHERE author_id = %s',
+            [user_id, author_id],
+        )
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Пересобирает все ленты с нуля по текущим подпискам.
+
+    Записи строятся в самой БД: INSERT … SELECT на каждые batch_size
+    подписок, без выгрузки постов в Python.
+    """
+    entries = TimelineEntry._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.all().delete()
+        follow_ids = Follow.objects.order_by('pk').values_list(
+            'pk', flat=True)
+        last_id = 0
+        while True:
+            bounds = list(follow_ids.filter(pk__gt=last_id)[:batch_size])
+            if not bounds:
+                break
+            cursor.execute(
+                f'INSERT INTO {entries}'
+                ' (user_id, post_id, author_id, pub_date)'
+                ' SELECT f.user_id, p.id, p.author_id, p.pub_date'
+                f' FROM {Follow._meta.db_table} f'
+                f' JOIN {Post._meta.db_table} p ON p.author_id = f.author_id'
+                ' WHERE f.id > %s AND f.id <= %s',
+                [last_id, bounds[-1]],
+            )
+            last_id = bounds[-1]
+    return TimelineEntry.objects.count()
+
+
+def _bulk_insert(entries, batch_size):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
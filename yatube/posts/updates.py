@@ -0,0 +1,180 @@
+"""«Новые посты с момента …» для главной ленты и ленты подписок.
+
+Клиент передаёт since — курсор самого нового поста, который он видел, —
+и получает число более новых постов или их карточки. Запрос с ожиданием
+(long-poll и поток server-sent events) не держит соединение с базой,
+пока ждёт: он спит на уведомлении notifier, которое post_create
+поднимает после коммита, и сверяется с базой, только когда проснулся.
+
+Уведомление живёт в памяти процесса. Пост, опубликованный другим
+процессом, ожидающий заметит при плановой сверке раз в POLL_INTERVAL.
+"""
+import json
+import math
+import threading
+import time
+
+from django.db import connections
+from django.db.models import Q
+
+from .paginators import BACKWARD, decode_cursor, encode_cursor
+
+MAX_COUNT = 100
+MAX_WAIT = 25
+POLL_INTERVAL = 15
+STREAM_SECONDS = 300
+
+
+class PostNotifier:
+    """Версия, которая растёт с каждым опубликованным в процессе постом."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.version = 0
+
+    def notify(self):
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+
+    def wait(self, version, timeout):
+        """Ждёт версии новее version не дольше timeout секунд.
+
+        Возвращает текущую версию: совпадение с version значит, что
+        за это время ничего не опубликовали.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.version != version, timeout)
+            return self.version
+
+
+notifier = PostNotifier()
+
+
+def since_cursor(item, date_field='pub_date', pk_field='pk'):
+    """Курсор «всё новее item» — тот же, что previous_cursor ленты."""
+    return encode_cursor(
+        BACKWARD, getattr(item, date_field), getattr(item, pk_field))
+
+
+def parse_since(cursor):
+    """(pub_date, pk) из курсора since; для испорченного — None."""
+    decoded = decode_cursor(cursor or '')
+    if decoded is None or decoded[1] is None:
+        return None
+    return decoded[1], decoded[2]
+
+
+def parse_wait(value):
+    """Секунды long-poll из ?wait=: от 0 до MAX_WAIT.
+
+    nan не сравнивается ни с чем, и min() пропустил бы его дальше,
+    а Condition.wait_for() с таймаутом nan не вернётся никогда.
+    """
+    try:
+        wait = float(value or 0)
+    except ValueError:
+        return 0.0
+    if not math.isfinite(wait):
+        return 0.0
+    return max(0.0, min(wait, MAX_WAIT))
+
+
+def release_connection():
+    """Отдаёт соединения с базами (и с репликами) на время ожидания.
+
+    Внутри транзакции (например, в тестах) закрыть соединение нельзя —
+    тогда оно остаётся открытым.
+    """
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+class Feed:
+    """Лента, в которой ищем посты новее since.
+
+    related — поле с постом, если лента состоит из записей
+    материализованной ленты подписок, а не из самих постов.
+    """
+
+    def __init__(self, queryset, date_field='pub_date', pk_field='pk',
+                 related=None):
+        self.queryset = queryset
+        self.date_field = date_field
+        self.pk_field = pk_field
+        self.related = related
+
+    def newer(self, since):
+        pub_date, pk = since
+        return self.queryset.filter(
+            Q(**{f'{self.date_field}__gt': pub_date})
+            | Q(**{self.date_field: pub_date, f'{self.pk_field}__gt': pk})
+        )
+
+    def count(self, since):
+        """Число новых постов, но не больше MAX_COUNT + 1.
+
+        Срез внутри COUNT(*) останавливает чтение индекса, сколько бы
+        постов ни набежало, пока клиент не смотрел.
+        """
+        return self.newer(since)[:MAX_COUNT + 1].count()
+
+    def cards(self, since, limit):
+        """Ближайшие к since новые посты и курсор since после них."""
+        items = list(self.newer(since).order_by(
+            self.date_field, self.pk_field)[:limit])
+        if not items:
+            return [], None
+        posts = [
+            getattr(item, self.related) if self.related else item
+            for item in reversed(items)
+        ]
+        return posts, since_cursor(items[-1], self.date_field, self.pk_field)
+
+
+def status(count):
+    return {'count': min(count, MAX_COUNT), 'more': count > MAX_COUNT}
+
+
+def wait_for_new(feed, since, timeout):
+    """Число новых постов; если их нет — ждёт уведомления до timeout.
+
+    Сверка с базой — до ожидания и после него, поэтому запрос делает
+    не больше двух COUNT(*), как бы долго ни ждал.
+    """
+    version = notifier.version
+    count = feed.count(since)
+    if count or timeout <= 0:
+        return count
+    release_connection()
+    notifier.wait(version, timeout)
+    return feed.count(since)
+
+
+def event_stream(feed, since, poll_interval=None, duration=None):
+    """Поток server-sent events с числом новых постов.
+
+    Событие уходит при каждом изменении числа, в промежутках —
+    комментарий-пинг, чтобы прокси не закрыли соединение. Через duration
+    секунд поток заканчивается, и EventSource переподключается сам.
+    """
+    poll_interval = POLL_INTERVAL if poll_interval is None else poll_interval
+    duration = STREAM_SECONDS if duration is None else duration
+    deadline = time.monotonic() + duration
+    yield f'retry: {POLL_INTERVAL * 1000}\n\n'
+    sent = None
+    version = notifier.version
+    while True:
+        count = feed.count(since)
+        release_connection()
+        if count != sent:
+            sent = count
+            yield f'event: posts\ndata: {json.dumps(status(count))}\n\n'
+        else:
+            yield ': ping\n\n'
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        version = notifier.wait(version, min(poll_interval, remaining))
@@ -16,7 +16,16 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('new/', views.new_posts, name='new_posts'),
+    path('new/stream/', views.new_posts_stream, name='new_posts_stream'),
+    path('search/', views.post_search, name='search'),
+    path('search/json/', views.post_search_json, name='search_json'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,30 +1,52 @@
-from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.shortcuts import redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from .models import Follow, Group, Post, User
+from .models import Follow, Group, Post, TimelineEntry, User
+from core.query_budget import query_budget
+from core.thumbnails import queue_thumbnails
+from core.transactions import write_atomic
+from posts import archive, conditional, recommendations, updates
+from posts.caching import feed_generation, follow_generation
+from posts.counters import get_user_stats
 from posts.forms import CommentForm, PostForm
+from posts.paginators import (COMMENTS_PER_PAGE, POSTS_PER_PAGE,
+                              CursorPaginator, paginate)
+from posts.search import search
 
 
+@query_budget(5)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.index_etag)
 def index(request):
-    post_list = Post.objects.all().select_related('author')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj,
+        'feed_generation': feed_generation(),
+        'new_posts_since': _new_posts_since(request, page_obj),
     }
     template = 'posts/index.html'
     return render(request, template, context)
 
 
+@query_budget(7)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts_group.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts_group.select_related('author', 'group')
+    page_obj = paginate(
+        request, posts,
+        archive=group.archived_posts.select_related('author', 'group'),
+        archive_newest=archive.horizon(),
+    )
     context = {
         'page_obj': page_obj,
         'group': group,
@@ -33,13 +55,19 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@query_budget(10)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
-    count_posts = post_list.count()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    post_list = author.posts.select_related('author', 'group')
+    stats = get_user_stats(author)
+    page_obj = paginate(
+        request, post_list,
+        archive=author.archived_posts.select_related('author', 'group'),
+        archive_newest=archive.horizon(),
+    )
 
     following = (request.user.is_authenticated
                  and request.user.username != username
@@ -49,27 +77,70 @@ def profile(request, username):
     context = {
         'page_obj': page_obj,
         'author': author,
-        'count_posts': count_posts,
+        'recommendations': _recommendations(request),
+        'count_posts': stats.posts_count,
+        'stats': stats,
         'following': following,
     }
     template = 'posts/profile.html'
     return render(request, template, context)
 
 
+def _recommendations(request):
+    if not request.user.is_authenticated:
+        return None
+    return recommendations.recommended(request.user)
+
+
+def _comments_context(request, post):
+    """Страница комментариев поста с авторами, загруженными одним JOIN."""
+    order = 'newest' if request.GET.get('order') == 'newest' else 'oldest'
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PER_PAGE,
+        date_field='created',
+        oldest_first=order == 'oldest',
+    )
+    return {
+        'post': post,
+        'comments': paginator.get_page(request.GET.get('cursor')),
+        'comments_order': order,
+    }
+
+
+@query_budget(6)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    post = archive.find_post(post_id, related=('author__stats', 'group'))
+    if post is None:
+        raise Http404('Пост не найден.')
+    # Архивный пост только для чтения: форму комментария не показываем.
+    form = None if post.is_archived else CommentForm(request.POST or None)
     context = {
-        'post': post,
+        'author_stats': get_user_stats(post.author),
         'form': form,
-        'comments': comments,
+        **_comments_context(request, post),
     }
     template = 'posts/post_detail.html'
     return render(request, template, context)
 
 
+@query_budget(3)
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев для «Показать ещё»."""
+    post = archive.find_post(post_id)
+    if post is None:
+        raise Http404('Пост не найден.')
+    return render(
+        request,
+        'includes/comment_list.html',
+        _comments_context(request, post),
+    )
+
+
 @login_required
+@query_budget(9)
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -78,7 +149,13 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        form.save()
+
+        def publish():
+            form.save()
+            queue_thumbnails(post.image, post.pk)
+            transaction.on_commit(updates.notifier.notify)
+
+        write_atomic(publish)
         return redirect('posts:profile', post.author)
 
     form = PostForm()
@@ -86,9 +163,10 @@ def post_create(request):
 
 
 @login_required
+@query_budget(6)
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if request.user.id != post.author.id:
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post_id)
 
     form = PostForm(
@@ -97,7 +175,8 @@ def post_edit(request, post_id):
         files=request.FILES or None,
     )
     if form.is_valid():
-        form.save()
+        post = write_atomic(form.save)
+        queue_thumbnails(post.image, post.pk)
         return redirect('posts:post_detail', post_id=post_id)
 
     form = PostForm(instance=post)
@@ -109,6 +188,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@query_budget(5)
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -116,33 +196,155 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write_atomic(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@query_budget(3)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    entries = TimelineEntry.objects.filter(
+        user=request.user).select_related('post__author', 'post__group')
+    page_obj = paginate(request, entries, pk_field='post_id')
+    page_obj.object_list = [entry.post for entry in page_obj]
     context = {
         'page_obj': page_obj,
+        'feed_generation': feed_generation(),
+        'follow_generation': follow_generation(request.user.id),
+        'new_posts_since': _new_posts_since(request, page_obj),
+        'recommendations': _recommendations(request),
     }
     return render(request, 'posts/follow.html', context)
 
 
+def _new_posts_since(request, page_obj):
+    """Курсор для проверки новых постов — только на первой странице."""
+    if request.GET.get('page') or request.GET.get('cursor') or not page_obj:
+        return None
+    return updates.since_cursor(page_obj[0])
+
+
+def _updates_feed(request):
+    if request.GET.get('feed') == 'follow':
+        entries = TimelineEntry.objects.filter(
+            user=request.user).select_related('post__author', 'post__group')
+        return updates.Feed(entries, pk_field='post_id', related='post')
+    return updates.Feed(Post.objects.select_related('author', 'group'))
+
+
+def _updates_request(request):
+    """Лента и since из запроса либо ответ с ошибкой."""
+    if (request.GET.get('feed') == 'follow'
+            and not request.user.is_authenticated):
+        return None, None, JsonResponse(
+            {'error': 'Лента подписок доступна после входа.'}, status=401)
+    since = updates.parse_since(request.GET.get('since'))
+    if since is None:
+        return None, None, JsonResponse(
+            {'error': 'Нужен курсор since.'}, status=400)
+    return _updates_feed(request), since, None
+
+
+@query_budget(6)
+def new_posts(request):
+    """Сколько постов новее since, а с ?cards=1 — и их карточки.
+
+    ?wait=N (до MAX_WAIT секунд) превращает запрос в long-poll: если
+    новых постов нет, ответ придёт после публикации или по таймауту.
+    """
+    feed, since, error = _updates_request(request)
+    if error:
+        return error
+    wait = updates.parse_wait(request.GET.get('wait'))
+    count = updates.wait_for_new(feed, since, wait)
+    data = updates.status(count)
+    if count and request.GET.get('cards'):
+        posts, next_since = feed.cards(since, POSTS_PER_PAGE)
+        data['html'] = render_to_string(
+            'posts/includes/post_cards.html', {'posts': posts}, request)
+        data['since'] = next_since
+    return JsonResponse(data)
+
+
+def new_posts_stream(request):
+    """То же число новых постов потоком server-sent events."""
+    feed, since, error = _updates_request(request)
+    if error:
+        return error
+    response = StreamingHttpResponse(
+        updates.event_stream(feed, since), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Иначе nginx копит поток в буфере и отдаёт его пачками.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
+@query_budget(16)
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     if author != user:
-        Follow.objects.get_or_create(user=user, author=author)
+        write_atomic(lambda: Follow.objects.get_or_create(
+            user=user, author=author))
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@query_budget(11)
 def profile_unfollow(request, username):
     user = request.user
-    Follow.objects.filter(user=user, author__username=username).delete()
+    write_atomic(Follow.objects.filter(
+        user=user, author__username=username).delete)
     return redirect('posts:profile', username=username)
+
+
+def _search_results(request):
+    query = request.GET.get('q', '')
+    group = author = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    rows, next_cursor = search(
+        query,
+        group_id=group.pk if group else None,
+        author_id=author.pk if author else None,
+        cursor=request.GET.get('cursor'),
+    )
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for post_id, _ in rows])
+    results = [posts[post_id] for post_id, _ in rows if post_id in posts]
+    return {
+        'query': query,
+        'group': group,
+        'author': author,
+        'results': results,
+        'next_cursor': next_cursor,
+    }
+
+
+@query_budget(4)
+def post_search(request):
+    context = _search_results(request)
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(4)
+def post_search_json(request):
+    context = _search_results(request)
+    results = [
+        {
+            'id': post.pk,
+            'text': post.text,
+            'author': post.author.username,
+            'group': post.group.slug if post.group else None,
+            'pub_date': post.pub_date.isoformat(),
+            'url': reverse('posts:post_detail', args=[post.pk]),
+        }
+        for post in context['results']
+    ]
+    return JsonResponse({
+        'results': results,
+        'next_cursor': context['next_cursor'],
+    })
@@ -1,12 +1,29 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# manage.py test или pytest: прогон не должен делить файл кеша
+# с запущенным сервером и с другими прогонами.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+if TESTING:
+    CACHE_DIR = tempfile.mkdtemp(prefix='yatube-test-cache-')
+    atexit.register(shutil.rmtree, CACHE_DIR, True)
+else:
+    CACHE_DIR = BASE_DIR
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
     }
 }
 
@@ -34,6 +51,12 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ] 
 
+# Адреса, которым отдаётся /metrics/ (сборщик Prometheus).
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+# Адреса, которым ?profile_templates включает профиль рендера шаблонов
+# (core.template_profiler).
+TEMPLATE_PROFILER_ALLOWED_IPS = INTERNAL_IPS
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:main_page'
 # LOGOUT_REDIRECT_URL = 'posts:main_page'
@@ -42,6 +65,11 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 
+# Превышение бюджета SQL-запросов view (core.query_budget) пишется
+# в лог; тесты бюджетов включают исключение через override_settings.
+QUERY_BUDGET_RAISE = False
+
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -49,6 +77,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -60,7 +89,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.template_profiler.TemplateProfilerMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db_routing.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,6 +107,12 @@ ROOT_URLCONF = 'yatube.urls'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Кто отдаёт байты картинок после проверки доступа в core.media:
+# 'x-accel-redirect' (nginx, internal-location MEDIA_ACCEL_PREFIX,
+# смотрящий в MEDIA_ROOT), 'x-sendfile' (Apache, lighttpd) или пусто —
+# сам Django через FileResponse.
+MEDIA_ACCEL = ''
+MEDIA_ACCEL_PREFIX = '/protected-media/'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
@@ -100,13 +139,28 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# core.backends.sqlite3 — стандартный бэкенд с WAL, mmap, busy timeout
+# и транзакциями BEGIN IMMEDIATE (подробности в модуле).
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Реплика для чтения. Локально её изображает второй файл SQLite:
+    # скопируйте в него db.sqlite3 и впишите 'replica' в DATABASE_REPLICAS.
+    'replica': {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+    },
 }
 
+# Алиасы из DATABASES, на которые core.db_routing отправляет чтения
+# view с безопасным методом. Пусто — всё идёт в default.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['core.db_routing.ReplicaRouter']
+# Сколько секунд после записи чтения пользователя идут в default.
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -146,3 +200,14 @@ USE_TZ = True
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 STATIC_URL = '/static/'
+# Сюда collectstatic собирает файлы; боевые настройки добавляют имена
+# с хешем и сжатые копии (core.staticfiles).
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Миниатюры для лент режутся в фоне при сохранении поста (core.thumbnails).
+# 0 — резать синхронно, без пула потоков.
+THUMBNAIL_WORKERS = 2
+# Первая миниатюра — та, что показывает карточка поста (posts.fragments).
+THUMBNAIL_PREGENERATE = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
@@ -0,0 +1,45 @@
+"""Боевые настройки (DJANGO_SETTINGS_MODULE=yatube.settings_production).
+
+Отличия от yatube.settings: DEBUG выключен, без debug_toolbar,
+шаблоны читаются с диска и разбираются один раз на процесс
+(cached.Loader) вместо разбора на каждый запрос, а collectstatic пишет
+статику с хешем в имени и сжатыми копиями (core.staticfiles).
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, SECRET_KEY, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if not middleware.startswith('debug_toolbar.')
+]
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    # loaders и APP_DIRS вместе задавать нельзя.
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor
+            for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+            if processor != 'django.template.context_processors.debug'
+        ],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL', '')
@@ -1,7 +1,10 @@
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.media import serve as serve_media
+from core.staticfiles import serve as serve_static
+from core.views import metrics
 
 
 handler404 = 'core.views.page_not_found'
@@ -14,7 +17,19 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('', include('posts.urls', namespace='posts')),
+    path('api/v1/', include('api.urls', namespace='api')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics/', metrics, name='metrics'),
+    # Обычно статику отдаёт nginx; сюда доходят только промахи мимо него.
+    re_path(
+        r'^%s(?P<path>.+)$' % settings.STATIC_URL.lstrip('/'),
+        serve_static,
+    ),
+    re_path(
+        r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'),
+        serve_media,
+        name='media',
+    ),
 ]
 
 